@@ -0,0 +1,54 @@
+"""Time do_parse.build_file_sections on synthetic .do files of growing size.
+
+Each file has one infix variable, variable label, value labels and
+`replace ... / 10` format line per variable, split over two record types.
+Time per variable should stay flat as the number of variables grows.
+
+    python benchmarks/do_parse_replace.py --vars 5000 10000 20000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from ipums.tools.do_parse import build_file_sections
+
+
+def write_do_file(path, n_vars):
+    half = n_vars // 2
+    with open(path, "w") as f:
+        for rectype, names in (("H", range(half)), ("P", range(half, n_vars))):
+            f.write("infix ///\n")
+            for i in names:
+                kind = "str" if i % 7 == 0 else "long"
+                f.write(f"  {kind} v{i} {i * 3 + 1}-{i * 3 + 3} ///\n")
+            f.write(f'drop if rectype != `"{rectype}"\'\n')
+        for i in range(n_vars):
+            f.write(f"replace v{i} = v{i} / {10 ** (i % 3 + 1)}\n")
+        for i in range(n_vars):
+            f.write(f'label var v{i} `"Variable {i}"\'\n')
+        for i in range(0, n_vars, 5):
+            for value in range(3):
+                f.write(f'label define v{i}_lbl {value} `"Value {value}"\'\n')
+            f.write(f"label values v{i} v{i}_lbl\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vars", type=int, nargs="+", default=[5000, 10000, 20000])
+    args = parser.parse_args()
+
+    print(f"{'vars':>7} {'seconds':>9} {'us/var':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_vars in args.vars:
+            path = Path(tmp) / f"bench_{n_vars}.do"
+            write_do_file(path, n_vars)
+            start = time.perf_counter()
+            sections = build_file_sections(path)
+            elapsed = time.perf_counter() - start
+            assert len(sections["DataList"]) == n_vars
+            print(f"{n_vars:>7} {elapsed:>9.2f} {elapsed / n_vars * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Time freq_quick's sharded counting at increasing --jobs.
+
+Writes a synthetic fixed-width file, counts it serially and then with each
+requested number of workers, checks every sharded result against the serial
+one and prints the wall time and speedup of each run.
+
+    python benchmarks/freq_quick_jobs.py --records 100000000 --jobs 1 2 4 8 16 32
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from ipums.tools.freq_quick import count_data_file
+
+RECORD_WIDTH = 40
+
+
+def write_data_file(path, records, chunk=1_000_000):
+    rng = np.random.default_rng(0)
+    with open(path, "wb") as f:
+        for start in range(0, records, chunk):
+            n = min(chunk, records - start)
+            rows = rng.integers(ord("0"), ord("9") + 1, (n, RECORD_WIDTH + 1))
+            rows = rows.astype(np.uint8)
+            rows[:, 0] = np.where(rng.random(n) < 0.7, ord("P"), ord("H"))
+            rows[:, -1] = ord("\n")
+            f.write(rows.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=10_000_000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--data_file", help="Count this file instead")
+    args = parser.parse_args()
+
+    # age x sex style key, person records only, weighted by a 6-digit column
+    spec = ([[(2, 3), (5, 1)]], ("P", 1, 1), (30, 6))
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = args.data_file or Path(tmp) / "bench.dat"
+        if not args.data_file:
+            write_data_file(data_file, args.records)
+        start = time.perf_counter()
+        serial = count_data_file(data_file, spec, 1)
+        base = time.perf_counter() - start
+        print(f"{'jobs':>5} {'seconds':>9} {'speedup':>8}")
+        print(f"{1:>5} {base:>9.2f} {1:>8.2f}")
+        for jobs in args.jobs:
+            if jobs == 1:
+                continue
+            start = time.perf_counter()
+            sharded = count_data_file(data_file, spec, jobs)
+            elapsed = time.perf_counter() - start
+            assert sharded[0] == serial[0]
+            for (values, sums), (s_values, s_sums) in zip(serial[1], sharded[1]):
+                assert np.array_equal(values, s_values)
+                assert np.array_equal(sums, s_sums)
+            print(f"{jobs:>5} {elapsed:>9.2f} {base / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
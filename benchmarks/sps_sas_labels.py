@@ -0,0 +1,86 @@
+"""Time sps_parse and sas_parse on synthetic syntax files of growing size.
+
+Each file has one variable per two columns, split over two record types,
+with a variable label each and 20 value labels for every variable, the
+shape of a large recode file.
+
+    python benchmarks/sps_sas_labels.py --vars 1000 5000 10000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from ipums.tools import sas_parse, sps_parse
+
+VALUES = 20
+
+
+def rectypes(n_vars):
+    half = n_vars // 2
+    return (("H", range(half)), ("P", range(half, n_vars)))
+
+
+def write_sps_file(path, n_vars):
+    with open(path, "w") as f:
+        for rectype, names in rectypes(n_vars):
+            f.write(f'record type "{rectype}".\n')
+            f.write("data list\n")
+            for i in names:
+                f.write(f"  v{i} {i * 2 + 1}-{i * 2 + 2}\n")
+            f.write(".\n")
+        f.write("VARIABLE LABELS\n")
+        for i in range(n_vars):
+            f.write(f'  v{i} "Variable {i}"\n')
+        f.write(".\n")
+        f.write("VALUE LABELS\n")
+        for i in range(n_vars):
+            f.write(f"  /v{i}\n")
+            for value in range(VALUES):
+                f.write(f'  {value} "Value {value}"\n')
+        f.write(".\n")
+
+
+def write_sas_file(path, n_vars):
+    with open(path, "w") as f:
+        f.write("proc format;\n")
+        for i in range(n_vars):
+            f.write(f"value v{i}_f\n")
+            for value in range(VALUES):
+                f.write(f'  {value} = "Value {value}"\n')
+            f.write(";\n")
+        f.write("RUN;\n")
+        f.write("data out;\n")
+        for rectype, names in rectypes(n_vars):
+            f.write(f'if RECTYPE = "{rectype}" then input\n')
+            for i in names:
+                f.write(f"  v{i} {i * 2 + 1}-{i * 2 + 2}\n")
+            f.write(";\n")
+        f.write("LABEL\n")
+        for i in range(n_vars):
+            f.write(f'  v{i} = "Variable {i}"\n')
+        f.write(";\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vars", type=int, nargs="+", default=[1000, 5000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'parser':>9} {'vars':>7} {'labels':>8} {'seconds':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for module, write in ((sps_parse, write_sps_file), (sas_parse, write_sas_file)):
+            for n_vars in args.vars:
+                path = Path(tmp) / f"bench_{n_vars}"
+                write(path, n_vars)
+                start = time.perf_counter()
+                data_list = module.parse(path)
+                elapsed = time.perf_counter() - start
+                assert len(data_list) == n_vars
+                assert all(len(dl.valuelabels) == VALUES for dl in data_list)
+                name = module.__name__.rsplit(".", 1)[-1]
+                print(f"{name:>9} {n_vars:>7} {n_vars * VALUES:>8} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
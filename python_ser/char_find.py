@@ -0,0 +1,258 @@
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import polars as pl
+from ipums.tools.local_lib import utils
+from ipums.tools.column_index import sample_index
+from ipums.tools.fixed_width import data_blocks
+
+from ipums.metadata import DataDictionary, Samples
+
+# Lines searched per call to finditer, bounding the matches held at once
+BLOCK_LINES = 1 << 16
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="char_find",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""
+-----------------
+Find characters in variables of data files
+-----------------
+This program searches one or more data files for any Python regular
+expression pattern and reports on variables in which that pattern is found.
+
+Command-line arguments:
+    pattern
+    data source(s)
+
+A data source can be given as a path to a .dat or .dat.gz fixed width file.
+Alternatively, if working in a workspace, a data source can be referred to with
+a sample, e.g. cps1963_03s, or a sample/version, e.g. cps1963_03s/3.
+The program will find the data in the workspace matching that sample(/version).
+
+The default output is tab-delimited and contains the following fields:
+    file name
+    text found
+    record type
+    column location (where the text ends)
+    source variable at that column (with --findvars)
+    number of times the text was found at this location
+
+Detailed output can be requested with option -d. It documents every
+occurence of text that matches the pattern. The detailed output
+contains the following fields:
+    file name
+    record type
+    line number
+    column number
+    text found
+
+Output:
+    frequency distribution    Written to the screen by default.
+""",
+    )
+    parser.add_argument("pattern", help="Pattern to search for.")
+    parser.add_argument(
+        "data_sources",
+        nargs="+",
+        help="Data source files (.dat or .dat.gz fixed width files), or samples in a workspace.",
+    )
+    parser.add_argument(
+        "-r",
+        "--noregex",
+        action="store_true",
+        help="Treat the pattern as a literal string rather than a regular expression.",
+    )
+    parser.add_argument(
+        "-i", "--ignorert", action="store_true", help="Ignore record types."
+    )
+    parser.add_argument(
+        "-s",
+        "--rtstart",
+        type=int,
+        default=1,
+        help="Start column for record type variable.",
+    )
+    parser.add_argument(
+        "-w", "--rtwidth", type=int, default=1, help="Width of record type variable."
+    )
+    parser.add_argument(
+        "-d",
+        "--detail",
+        action="store_true",
+        help="Request detailed output in addition to the default output.",
+    )
+    parser.add_argument(
+        "--findvars",
+        action="store_true",
+        help="Report the source variable each column falls in, from the data dictionary of each data source's sample (you must also specify a project with -p).",
+    )
+    parser.add_argument(
+        "-p", "--project", help="Specify project. Required for --findvars."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of data sources to search at once (default: 1)",
+    )
+    return parser
+
+
+def compile_pattern(pattern, noregex=False):
+    """The pattern as a compiled bytes regex in which ^ and $ match at the
+    start and end of every line."""
+    pattern = pattern.encode("latin-1")
+    if noregex:
+        pattern = re.escape(pattern)
+    return re.compile(pattern, re.MULTILINE)
+
+
+def find_matches(data, pattern, block_lines=BLOCK_LINES):
+    """Every match of pattern within a line of a FixedWidthFile.
+
+    The pattern is run over whole blocks of lines at once. A match that runs
+    past the end of its line is discarded along with the others in the lines
+    it covers, and those lines are searched again one at a time.
+
+    Returns the index of the line of each match, the 1-indexed column where
+    it ends, and the matched bytes.
+    """
+    starts = data.starts
+    line_ends = starts + data.lengths
+    buf_end = len(data.buf)
+    lines = []
+    columns = []
+    texts = []
+    for first in range(0, len(data), block_lines):
+        last = min(first + block_lines, len(data))
+        end = starts[last] if last < len(data) else buf_end
+        found = [
+            (m.start(), m.end(), m.group())
+            for m in pattern.finditer(data.buf, int(starts[first]), int(end))
+        ]
+        if not found:
+            continue
+        spans = np.array([f[:2] for f in found], dtype=np.int64)
+        line = np.searchsorted(starts, spans[:, 0], side="right") - 1
+        end_line = line
+        spanning = spans[:, 1] > line_ends[line]
+        if spanning.any():
+            end_line = np.searchsorted(starts, spans[:, 1] - 1, side="right") - 1
+        redo = set()
+        for a, b in zip(line[spanning].tolist(), end_line[spanning].tolist()):
+            redo.update(range(a, b + 1))
+        keep = ~np.isin(line, list(redo))
+        lines.append(line[keep])
+        columns.append(spans[keep, 1] - starts[line[keep]])
+        texts.extend(f[2] for f, k in zip(found, keep.tolist()) if k)
+        for i in sorted(redo):
+            matches = list(pattern.finditer(data.record(i)))
+            lines.append(np.full(len(matches), i, dtype=np.int64))
+            columns.append(np.array([m.end() for m in matches], dtype=np.int64))
+            texts.extend(m.group() for m in matches)
+    if not lines:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), []
+    lines = np.concatenate(lines)
+    columns = np.concatenate(columns)
+    order = np.lexsort((columns, lines))
+    return lines[order], columns[order], [texts[i] for i in order.tolist()]
+
+
+def find_in_source(data_source, args):
+    """Search one data source, returning a DataFrame with a row per match:
+    File, RecType, LineNum, Column and Text, plus Svar with --findvars."""
+    pattern = compile_pattern(args.pattern, args.noregex)
+    found = []
+    first_line = 0
+    # A gzipped file is searched a block of records at a time
+    for data in data_blocks(data_source):
+        lines, columns, texts = find_matches(data, pattern)
+        if args.ignorert:
+            rectypes = np.full(len(lines), "", dtype=object)
+        else:
+            try:
+                rectype_column = data.column(args.rtstart, args.rtwidth)
+            except ValueError as e:
+                raise ValueError(
+                    "Attempted to index record type variable out of range. " + str(e)
+                )
+            rectypes = np.char.decode(rectype_column[lines], "latin-1").astype(object)
+        found.append((lines + first_line, columns, texts, rectypes))
+        first_line += len(data)
+    lines = np.concatenate([f[0] for f in found])
+    columns = np.concatenate([f[1] for f in found])
+    texts = [t for f in found for t in f[2]]
+    rectypes = np.concatenate([f[3] for f in found])
+    df = pl.DataFrame(
+        {
+            "File": [str(data_source)] * len(lines),
+            "RecType": rectypes.tolist(),
+            "LineNum": lines + 1,
+            "Column": columns,
+            "Text": [t.decode("latin-1") for t in texts],
+        },
+        schema={
+            "File": pl.Utf8,
+            "RecType": pl.Utf8,
+            "LineNum": pl.Int64,
+            "Column": pl.Int64,
+            "Text": pl.Utf8,
+        },
+    )
+    if args.findvars:
+        sample = Samples(args.project).datafile_to_sample(Path(data_source).name)
+        assert sample is not None, "Sample not found for " + str(data_source)
+        index = sample_index(DataDictionary(sample, args.project), args.ignorert)
+        svars = index.find_many(rectypes, columns)
+        df = df.with_columns(pl.Series("Svar", svars.tolist(), dtype=pl.Utf8))
+    return df
+
+
+def summarize(matches):
+    """Count the matches of each text at each rectype and column."""
+    keys = ["File", "Text", "RecType", "Column"]
+    if "Svar" in matches.columns:
+        keys.append("Svar")
+    return (
+        matches.group_by(keys)
+        .agg(pl.col("LineNum").count().alias("N"))
+        .sort(keys)
+        .with_columns(
+            pl.format("'{}'", pl.col(c)).alias(c) for c in ["Text", "RecType"]
+        )
+    )
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.findvars and not args.project:
+        build_parser().error("-p is required with --findvars")
+    sources = [utils.resolve_data_file(source) for source in args.data_sources]
+    for source in sources:
+        if not os.path.exists(source):
+            print("The input file does not exist. Please check the file path.")
+            sys.exit(1)
+    if args.jobs > 1 and len(sources) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(sources))) as pool:
+            all_matches = list(pool.map(find_in_source, sources, [args] * len(sources)))
+    else:
+        all_matches = [find_in_source(source, args) for source in sources]
+    summary = pl.concat([summarize(matches) for matches in all_matches])
+    sys.stdout.write(summary.write_csv(separator="\t"))
+    if args.detail:
+        print("")
+        for matches in all_matches:
+            detail = matches.select("File", "RecType", "LineNum", "Column", "Text")
+            sys.stdout.write(detail.write_csv(separator="\t", include_header=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import numpy as np
+from ipums.tools.result_cache import ResultCache, content_hash, file_fingerprint
+
+
+def layout_from_dd(dd):
+    """(rectype, name, start, width) of every svar in a DataDictionary."""
+    layout = []
+    for svar in dd.all_svars:
+        loc = dd.svar_to_start_and_wid(svar)
+        layout.append(
+            (dd.svar_to_rectype(svar), svar, int(loc["start"]), int(loc["wid"]))
+        )
+    return layout
+
+
+def layout_from_variables(variables):
+    """(rectype, name, start, width) of every integrated variable."""
+    layout = []
+    for var in variables.all_variables:
+        loc = variables.variable_to_start_and_wid(var)
+        if isinstance(loc, dict):
+            loc = (loc["start"], loc["wid"])
+        layout.append(
+            (variables.variable_to_rectype(var), var, int(loc[0]), int(loc[1]))
+        )
+    return layout
+
+
+class ColumnIndex:
+    """Which variables cover a column of a record type.
+
+    Built from (rectype, name, start, width) entries. The variables of each
+    rectype are split into layers of variables that do not overlap one
+    another, each sorted by start column, so one binary search per layer
+    finds the variable of that layer covering a column. Most layouts fit in
+    one layer; wide or overlapping variables, such as recodes spanning
+    several source columns, go in the few further layers and never slow
+    lookups elsewhere in the record.
+
+    Pass ignorert=True to put every variable in one rectype, "", and look
+    columns up without regard to rectype.
+    """
+
+    def __init__(self, entries, ignorert=False):
+        by_rectype = {}
+        for rectype, name, start, width in entries:
+            rectype = "" if ignorert else rectype
+            start = int(start)
+            by_rectype.setdefault(rectype, []).append(
+                (start, start + int(width) - 1, name)
+            )
+        self.ignorert = ignorert
+        self.rectypes = {
+            rectype: interval_layers(intervals)
+            for rectype, intervals in by_rectype.items()
+        }
+
+    @classmethod
+    def from_data_dictionary(cls, dd, ignorert=False):
+        return cls(layout_from_dd(dd), ignorert)
+
+    @classmethod
+    def from_variables(cls, variables, ignorert=False):
+        return cls(layout_from_variables(variables), ignorert)
+
+    def __layers(self, rectype):
+        if self.ignorert:
+            rectype = ""
+        return self.rectypes.get(rectype, [])
+
+    def overlapping(self, rectype, start, width=1):
+        """Names of the variables overlapping width columns from start,
+        in order of start column."""
+        last = start + width - 1
+        found = []
+        for starts, ends, ranks, names in self.__layers(rectype):
+            # Within a layer ends are sorted too, so the overlapping
+            # variables are one contiguous run
+            lo = int(np.searchsorted(ends, start, side="left"))
+            hi = int(np.searchsorted(starts, last, side="right"))
+            found.extend((starts[i], ends[i], names[i]) for i in range(lo, hi))
+        return [name for _, _, name in sorted(found)]
+
+    def find(self, rectype, column):
+        """The name of the narrowest variable covering column, or None."""
+        best = None
+        for starts, ends, ranks, names in self.__layers(rectype):
+            i = int(np.searchsorted(starts, column, side="right")) - 1
+            if i >= 0 and ends[i] >= column and (best is None or ranks[i] < best[0]):
+                best = (ranks[i], names[i])
+        return None if best is None else best[1]
+
+    def find_many(self, rectypes, columns):
+        """find() for arrays of rectypes and columns, with "" where no
+        variable covers the column."""
+        rectypes = np.asarray(rectypes, dtype=object)
+        columns = np.asarray(columns)
+        result = np.full(len(columns), "", dtype=object)
+        groups = [""] if self.ignorert else self.rectypes
+        for rectype in groups:
+            if self.ignorert:
+                selected = np.arange(len(columns))
+            else:
+                selected = np.flatnonzero(rectypes == rectype)
+            cols = columns[selected]
+            best = np.full(len(cols), np.iinfo(np.int64).max)
+            for starts, ends, ranks, names in self.rectypes.get(rectype, []):
+                i = np.searchsorted(starts, cols, side="right") - 1
+                safe = np.maximum(i, 0)
+                hit = (i >= 0) & (ends[safe] >= cols) & (ranks[safe] < best)
+                best[hit] = ranks[safe[hit]]
+                result[selected[hit]] = names[safe[hit]]
+        return result
+
+
+def interval_layers(intervals):
+    """Split (start, end, name) intervals into layers of intervals that do
+    not overlap, as (starts, ends, ranks, names) arrays sorted by start.
+
+    Each layer takes, earliest end first, every interval that starts after
+    the last one it took, which puts as many intervals as possible in the
+    first layer and leaves the wide ones for later layers. ranks orders all
+    the intervals narrowest first, ties going to the earliest start, for
+    picking the narrowest of several covering a column.
+    """
+    ranked = sorted(intervals, key=lambda iv: (iv[1] - iv[0], iv[0], iv[1], iv[2]))
+    rank = {id(iv): r for r, iv in enumerate(ranked)}
+    remaining = sorted(intervals, key=lambda iv: (iv[1], iv[0], iv[2]))
+    layers = []
+    while remaining:
+        layer = []
+        rest = []
+        for iv in remaining:
+            if layer and iv[0] <= layer[-1][1]:
+                rest.append(iv)
+            else:
+                layer.append(iv)
+        starts, ends, names = zip(*layer)
+        layers.append(
+            (
+                np.array(starts),
+                np.array(ends),
+                np.array([rank[id(iv)] for iv in layer]),
+                np.array(names, dtype=object),
+            )
+        )
+        remaining = rest
+    return layers
+
+
+def sample_index(dd, ignorert=False):
+    """The ColumnIndex of a DataDictionary, cached on disk per sample until
+    its data dictionary file changes."""
+    cache = ResultCache("column_index")
+    key = cache.key(
+        project=dd.project,
+        sample=dd.sample,
+        dd=file_fingerprint(dd.xlpath),
+        ignorert=ignorert,
+        # Indexes pickled by an earlier version of this module are not reused
+        source=content_hash(__file__),
+    )
+    index = cache.get(key)
+    if index is None:
+        index = ColumnIndex.from_data_dictionary(dd, ignorert)
+        cache.put(key, index)
+    return index
@@ -1,8 +1,18 @@
 import argparse
-import os
+import collections
+import shlex
+import subprocess
 import sys
+import time
 import warnings
-from typing import List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+# Commands with any of these characters are run through a shell
+SHELL_CHARS = set("|&;<>()$`\\*?[]{}~#\n")
+# Lines of standard error kept from each command run
+STDERR_TAIL = 10
 
 
 def build_parser():
@@ -14,7 +24,16 @@ default wildcard is two asterisks; see option -w). For each subsequent argument
 supplied to the program, the wildcards will be replaced with the argument and 
 the command will be generated. By default, the program simply prints the 
 commands; to run them, use option -r. For a more powerful set of wildcards,
-see the -sp option.""",
+see the -sp option.
+
+Values can also be read one per line from a file, or from standard input
+with -v -. Commands are then generated, printed and run as the values are
+read, so any number of values can be given.
+
+When running, each command's exit code and wall time are reported as it
+finishes, and a summary follows at the end with the last lines of standard
+error of any command that failed. With -j N, up to N commands run at once.
+Running stops at the first failure unless -k is given.""",
         epilog="""Examples:
 
 # Copy some files.
@@ -35,7 +54,7 @@ command_maker.py --sp --aro -c 'mv %s.txt %05d.dat' a b c 1 2 3
     )
 
     inpt = parser.add_mutually_exclusive_group(required=True)
-    inpt.add_argument("--command", "-c", nargs="+", help="command with wildcards")
+    inpt.add_argument("--command", "-c", help="command with wildcards")
     inpt.add_argument(
         "-f",
         dest="FILE",
@@ -43,7 +62,12 @@ command_maker.py --sp --aro -c 'mv %s.txt %05d.dat' a b c 1 2 3
         help="Supply the command-with-wildcards via a file rather than on command line.",
     )
 
-    parser.add_argument("values", nargs="+", help="items to generate commands")
+    parser.add_argument("values", nargs="*", help="items to generate commands")
+    parser.add_argument(
+        "--values_file",
+        "-v",
+        help="Read further items, one per line, from this file ('-' for standard input). Commands are made and run as the items are read.",
+    )
     parser.add_argument(
         "--wildcard",
         "-w",
@@ -54,6 +78,20 @@ command_maker.py --sp --aro -c 'mv %s.txt %05d.dat' a b c 1 2 3
     parser.add_argument(
         "-r", action="store_true", help="Run the commands rather than printing them."
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of commands to run at once (applicable when running; default = 1).",
+    )
+    parser.add_argument(
+        "-k",
+        "--keep-going",
+        dest="keep_going",
+        action="store_true",
+        help="Keep running the remaining commands after one fails (applicable when running).",
+    )
     parser.add_argument(
         "-n",
         action="store_true",
@@ -76,112 +114,259 @@ command_maker.py --sp --aro -c 'mv %s.txt %05d.dat' a b c 1 2 3
     return parser
 
 
-def cmd_builder(args: argparse.Namespace) -> List[str]:
-    """Build commands. Decides whether or not to sprintf or proceed normally."""
+def cmd_builder(args: argparse.Namespace) -> Iterator[str]:
+    """Build commands. Decides whether or not to sprintf or proceed normally.
+
+    Commands are generated as they are asked for, so that a long list of
+    values is never held as a list of commands.
+    """
     process_potential_file(args)
+    values = iter_values(args)
+    if len(args.command) > 1:
+        # Every command goes through all of the values
+        values = list(values)
     if args.sp:
-        try:
-            res = sprintf(args)
-        except ValueError as e:
-            print("!!! ERROR PROCESSING COMMANDS !!!")
-            raise e
-    else:
-        res = normal(args)
-    return res
+        return report_errors(iter_sprintf(args.command, values, args.aro))
+    return iter_normal(args.command, values, args.X)
+
+
+def report_errors(commands: Iterator[str]) -> Iterator[str]:
+    try:
+        yield from commands
+    except ValueError as e:
+        print("!!! ERROR PROCESSING COMMANDS !!!")
+        raise e
 
 
 def process_potential_file(args: argparse.Namespace) -> None:
     """Processes if there is a file, moves those commands to command and shoves the "command" to values"""
     if args.FILE:
-        args.values = list(args.command) + args.values
+        args.values = ([args.command] if args.command else []) + args.values
         with open(args.FILE, "r") as f:
             args.command = [cmd.strip() for cmd in f.readlines()]
     else:
         args.command = [args.command]
 
 
+def iter_values(args: argparse.Namespace) -> Iterator[str]:
+    """The values given on the command line, then those read one per line
+    from --values_file ("-" for standard input) as they are needed."""
+    yield from args.values
+    source = args.values_file
+    if source is None:
+        return
+    f = sys.stdin if source == "-" else open(source, "r")
+    try:
+        for line in f:
+            value = line.strip()
+            if value:
+                yield value
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def convert_value(val):
+    """A value as a float if it has one dot, or an int, if it parses as one."""
+    try:
+        if val.count(".") == 1:
+            return float(val)
+        return int(val)
+    except (AttributeError, ValueError):
+        return val
+
+
 def sprintf(args: argparse.Namespace) -> List[str]:
     """Uses format-percents as a way to do wildcards. Also looks if using --aro."""
-    final_list = []
-    for i, val in enumerate(args.values):
-        try:
-            if val.count(".") == 1:
-                args.values[i] = float(val)
-            else:
-                args.values[i] = int(val)
-        except ValueError:
-            pass
-    for cmd in args.command:
+    args.values[:] = [convert_value(val) for val in args.values]
+    return list(iter_sprintf(args.command, args.values, args.aro))
+
+
+def iter_sprintf(
+    commands: List[str], values: Iterable, reorder: bool = False
+) -> Iterator[str]:
+    """Fill each command's format-percents with consecutive groups of values,
+    one command per group, reading the values as they are needed."""
+    for cmd in commands:
         size = cmd.count("%")
-        if args.aro:
-            aro(args, size, cmd, final_list)
-        else:
-            i = 0
-            k = 1
-            while k * size < len(args.values):
-                try:
-                    final_list.append(cmd % tuple(args.values[i : k * size]))
-                    i = k * size
-                    k += 1
-                except TypeError as e:
+        if reorder:
+            yield from iter_aro(cmd, size, [convert_value(val) for val in values])
+            continue
+        it = map(convert_value, values)
+        # Without percents every value is left over for the one command
+        group = tuple(islice(it, size)) if size else tuple(it)
+        while True:
+            try:
+                command = cmd % group
+            except TypeError:
+                if tuple(islice(it, 1)):
                     raise ValueError(
-                        f"Incorrect value types given. Types do not match.\nCommand:{cmd} \nValues:{tuple(args.values[i : k * size])}"
+                        f"Incorrect value types given. Types do not match.\nCommand:{cmd} \nValues:{group}"
                     )
-            try:
-                final_list.append(cmd % tuple(args.values[i:]))
-            except TypeError as e:
                 raise ValueError(
-                    f"Too many arguments given: {args.values}",
+                    f"Too many arguments given: {group}",
                 )
-    return final_list
+            yield command
+            group = tuple(islice(it, size))
+            if not group:
+                break
 
 
 def aro(args: argparse.Namespace, size: int, cmd: str, final_list: List[str]) -> None:
     """Does some nifty value reordering to fit wildcards"""
-    if size != 0 and len(args.values) % size == 0:
-
-        def split_list(alist, wanted_parts):
-            length = len(alist)
-            return [
-                alist[i * length // wanted_parts : (i + 1) * length // wanted_parts]
-                for i in range(wanted_parts)
-            ]
-
-        parts = split_list(args.values, size)
-        parts = list(zip(*parts))
-        # print(parts)
-        for part in parts:
-            try:
-                final_list.append(cmd % part)
-            except TypeError as e:
-                raise ValueError(
-                    f"Incorrect value types given. Types do not match.\nCommand:{cmd} \nValues:{part}"
-                )
-    else:
+    final_list.extend(iter_aro(cmd, size, args.values))
+
+
+def iter_aro(cmd: str, size: int, values: List) -> Iterator[str]:
+    """Fill the command's size format-percents from size equal runs of the
+    values: the i-th command takes the i-th value of every run, picked out by
+    striding through the values rather than splitting them into runs."""
+    if size == 0 or len(values) % size != 0:
         raise ValueError(
             f"""Invalid number of arguments given: 
-{len(args.values)} values given to fill {size} spots. Does not divide evenly.
-{args.values}"""
+{len(values)} values given to fill {size} spots. Does not divide evenly.
+{values}"""
         )
+    rows = len(values) // size
+    for i in range(rows):
+        part = tuple(values[i::rows])
+        try:
+            yield cmd % part
+        except TypeError:
+            raise ValueError(
+                f"Incorrect value types given. Types do not match.\nCommand:{cmd} \nValues:{part}"
+            )
 
 
 def normal(args: argparse.Namespace) -> List[str]:
     """Adds values to replace wildcards in commands"""
-    final_list = []
-    for cmd in args.command:
-        if cmd.count(args.X) == 0:
+    return list(iter_normal(args.command, args.values, args.X))
+
+
+def iter_normal(commands: List[str], values: Iterable[str], X: str) -> Iterator[str]:
+    for cmd in commands:
+        if cmd.count(X) == 0:
             warnings.warn(UserWarning(f"!!WARNING: No wildcards found in {cmd}!!"))
-        for val in args.values:
-            exe = cmd.replace(args.X, val)
-            final_list.append(exe)
-    return final_list
+        for val in values:
+            yield cmd.replace(X, val)
+
+
+CommandResult = collections.namedtuple(
+    "CommandResult", ["command", "returncode", "seconds", "stderr_tail"]
+)
+
+
+def command_argv(cmd: str):
+    """The arguments to run cmd with directly, or None if it needs a shell."""
+    if SHELL_CHARS.intersection(cmd):
+        return None
+    try:
+        argv = shlex.split(cmd)
+    except ValueError:
+        return None
+    if not argv or "=" in argv[0]:
+        return None
+    return argv
 
 
-def determine_final(args: argparse.Namespace, final_list: List[str]) -> None:
-    """Run, print without newline, and print with newline"""
+def run_command(cmd: str, stdin=None) -> CommandResult:
+    """Run one command, passing its standard error through while keeping
+    the last STDERR_TAIL lines of it."""
+    start = time.perf_counter()
+    argv = command_argv(cmd)
+    tail = collections.deque(maxlen=STDERR_TAIL)
+    try:
+        proc = subprocess.Popen(
+            cmd if argv is None else argv,
+            shell=argv is None,
+            stdin=stdin,
+            stderr=subprocess.PIPE,
+        )
+    except OSError as e:
+        return CommandResult(cmd, 127, time.perf_counter() - start, [str(e)])
+    for line in proc.stderr:
+        line = line.decode(errors="replace")
+        tail.append(line.rstrip("\n"))
+        sys.stderr.write(line)
+        sys.stderr.flush()
+    returncode = proc.wait()
+    return CommandResult(cmd, returncode, time.perf_counter() - start, list(tail))
+
+
+def run_commands(
+    commands: Iterable[str], jobs: int = 1, keep_going: bool = False, stdin=None
+) -> List[CommandResult]:
+    """Run commands with up to jobs at once, reporting each one as it
+    finishes and a summary at the end on standard error.
+
+    Commands are taken from the iterable only as they are started, so they
+    can be generated while earlier ones run. Unless keep_going, no more
+    commands are started once one fails. Returns the results of the
+    commands that failed.
+    """
+    jobs = max(jobs, 1)
+    start = time.perf_counter()
+    commands = iter(commands)
+    failed = []
+    ran = 0
+    command_seconds = 0.0
+    running = set()
+    exhausted = stop = False
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while True:
+            while not (exhausted or stop) and len(running) < jobs:
+                cmd = next(commands, None)
+                if cmd is None:
+                    exhausted = True
+                else:
+                    running.add(pool.submit(run_command, cmd, stdin))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                ran += 1
+                command_seconds += result.seconds
+                print(
+                    f"[exit {result.returncode}, {result.seconds:.2f}s] {result.command}",
+                    file=sys.stderr,
+                )
+                if result.returncode != 0:
+                    failed.append(result)
+                    stop = not keep_going
+    print_summary(ran, failed, time.perf_counter() - start, command_seconds)
+    if stop and next(commands, None) is not None:
+        print(
+            "Stopped at the first failure; later commands were not run.",
+            file=sys.stderr,
+        )
+    return failed
+
+
+def print_summary(
+    ran: int, failed: List[CommandResult], seconds: float, command_seconds: float
+) -> None:
+    print(
+        f"Commands run: {ran}, succeeded: {ran - len(failed)}, "
+        + f"failed: {len(failed)}, wall time: {seconds:.2f}s, "
+        + f"command time: {command_seconds:.2f}s",
+        file=sys.stderr,
+    )
+    for result in failed:
+        print(
+            f"Failed with exit {result.returncode}: {result.command}", file=sys.stderr
+        )
+        for line in result.stderr_tail:
+            print(f"    {line}", file=sys.stderr)
+
+
+def determine_final(args: argparse.Namespace, final_list: Iterable[str]) -> bool:
+    """Run, print without newline, and print with newline. Returns whether
+    every command run succeeded."""
     if args.r:
-        for cmd in final_list:
-            os.system(cmd)
+        # Leave standard input to the values when they are read from it
+        stdin = subprocess.DEVNULL if args.values_file == "-" else None
+        return not run_commands(final_list, args.jobs, args.keep_going, stdin)
     elif args.n:
         for cmd in final_list:
             print(cmd, end=" ")
@@ -189,18 +374,23 @@ def determine_final(args: argparse.Namespace, final_list: List[str]) -> None:
     else:
         for cmd in final_list:
             print(cmd)
+    return True
 
 
 def main():
     parser = build_parser()
     args = parser.parse_args()
+    if not args.values and args.values_file is None:
+        parser.error("give the values on the command line or with --values_file")
     if args.d:
         sys.tracebacklimit = 0
     try:
         out = cmd_builder(args)
-        determine_final(args, out)
+        succeeded = determine_final(args, out)
     except Exception as e:
         raise e
+    if not succeeded:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,33 +1,257 @@
+import argparse
+import numpy as np
 import pandas as pd
-import subprocess
-import sys
-import os
+from ipums.tools import fw_to_parquet
+from ipums.tools.fixed_width import data_blocks
+from ipums.tools.result_cache import ResultCache, file_fingerprint
 
 
-def main():
-    args = sys.argv
-    cmd_args = ["/pkg/ipums/programming/bin/_cross_quick_rust_"] + args[1:]
-    out = subprocess.run(cmd_args, capture_output=True)
-    if "-h" in cmd_args or out.stdout != b"":
-        print(out.stdout.decode("utf-8"))
-        exit()
-    if out.stderr != b"":
-        print(out.stderr.decode("utf-8"))
-        exit()
-    df = pd.read_csv("crosstab_output.csv")
-    print(
-        pd.crosstab(
-            df["column_0"],
-            df["column_1"],
-            values=df["Frequency"],
-            aggfunc="sum",
-            margins=True,
-            margins_name="*TOT*",
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cross_quick",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""
+-----------------
+Quick crosstab
+-----------------
+This program will provide a crosstabulation of two or more variables from a fixed-column-width data file.
+With more than two variables, a table of the first two is printed for each observed
+combination of the others, or one row per observed combination with --long.
+
+Output:
+    crosstabulation       Written to the screen by default.
+""",
+    )
+    parser.add_argument("file_path", help="Path to a fixed-width data file")
+    parser.add_argument(
+        "starts_and_widths",
+        nargs="+",
+        type=int,
+        help="Start and Width of variables (e.g. 4 1 is the variable starting at position 4 with width 1). Should be at least 4 numbers given here (start width start width ...).",
+    )
+    parser.add_argument(
+        "-r", dest="rectype", help="Collect frequencies of only record type 'X'"
+    )
+    parser.add_argument(
+        "-s", type=int, default=1, help="Start column for record type variable"
+    )
+    parser.add_argument("-w", type=int, default=1, help="Width of record type variable")
+    parser.add_argument(
+        "-ws",
+        type=int,
+        help="Start column for weight variable (default = unweighted crosstab)",
+    )
+    parser.add_argument(
+        "-ww", type=int, default=1, help="Width for weight variable (default = 1)"
+    )
+    parser.add_argument(
+        "-wd",
+        type=float,
+        default=1,
+        help="Divisor to use with weights (default = 1). Every weighted count will be divided by N.",
+    )
+    parser.add_argument(
+        "-q", action="store_true", help="Explicitly quote values in the output"
+    )
+    parser.add_argument(
+        "-v",
+        action="store_true",
+        help="Verbose output (includes file and variable information)",
+    )
+    parser.add_argument(
+        "--long",
+        action="store_true",
+        help="Print one row per observed combination of values instead of tables",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="Always scan the data file, ignoring and not saving cached crosstabs",
+    )
+    return parser
+
+
+def crosstab(data, locs, weights=None):
+    """Crosstabulate any number of (start, width) columns of a FixedWidthFile.
+
+    Each column's values are coded as integers and the codes of a record are
+    combined into one index, so every combination is counted in a single
+    pass however many columns there are. Only observed combinations are kept.
+    Returns the sorted values of each column, a (combinations, columns) array
+    of codes into those values, and the count for each combination.
+    """
+    values = []
+    codes = []
+    for loc in locs:
+        column_values, column_codes = np.unique(data.column(*loc), return_inverse=True)
+        values.append(column_values)
+        codes.append(column_codes.ravel())
+    cells, counts = count_cells(values, codes, weights)
+    if weights is None:
+        counts = counts.astype(np.int64)
+    return values, cells, counts
+
+
+def merge_crosstabs(partials):
+    """Merge the crosstabs of several parts of a file into one.
+
+    The values of each column are merged, the codes of every part renumbered
+    into them, and the combinations counted again weighted by their counts.
+    """
+    columns = range(len(partials[0][0]))
+    values = [np.unique(np.concatenate([p[0][i] for p in partials])) for i in columns]
+    codes = [
+        np.concatenate(
+            [np.searchsorted(values[i], p[0][i])[p[1][:, i]] for p in partials]
         )
-        .fillna(0)
-        .convert_dtypes()
+        for i in columns
+    ]
+    counts = np.concatenate([p[2] for p in partials])
+    cells, merged = count_cells(values, codes, counts)
+    return values, cells, merged.astype(counts.dtype)
+
+
+def count_cells(values, codes, weights=None):
+    """The observed combinations of the codes of several columns, as a
+    (combinations, columns) array, with the count or summed weight of each."""
+    sizes = tuple(len(v) for v in values)
+    if np.prod(sizes, dtype=float) < 2**62:
+        cells, index = np.unique(
+            np.ravel_multi_index(codes, sizes), return_inverse=True
+        )
+        cells = np.stack(np.unravel_index(cells, sizes), axis=1)
+    else:
+        # Too many possible combinations to number them all
+        cells, index = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+    counts = np.bincount(index.ravel(), weights=weights, minlength=len(cells))
+    return cells.reshape(-1, len(values)), counts
+
+
+def table(values, cells, counts):
+    """Dense table of the first two columns of a crosstab, with the margins
+    in the last row and column."""
+    table = np.zeros((len(values[0]) + 1, len(values[1]) + 1), dtype=counts.dtype)
+    np.add.at(table, (cells[:, 0], cells[:, 1]), counts)
+    table[-1, :-1] = table[:-1, :-1].sum(axis=0)
+    table[:, -1] = table[:, :-1].sum(axis=1)
+    return table
+
+
+def slices(values, cells, counts):
+    """Split a crosstab of more than two columns into two-column crosstabs,
+    one for each observed combination of the remaining columns.
+
+    Yields the values of the remaining columns and the dense table.
+    """
+    rest, index = np.unique(cells[:, 2:], axis=0, return_inverse=True)
+    index = index.ravel()
+    for i, codes in enumerate(rest):
+        selected = index == i
+        key = [v[code] for v, code in zip(values[2:], codes)]
+        yield key, table(values, cells[selected], counts[selected])
+
+
+def run_crosstab(args):
+    sw = args.starts_and_widths
+    locs = list(zip(sw[0::2], sw[1::2]))
+    rectype = None
+    if args.rectype is not None:
+        rectype = (args.rectype, args.s, args.w)
+    weight = [(args.ws, args.ww)] if args.ws is not None else []
+    # Prefer a current columnar copy written by fw_to_parquet
+    data = fw_to_parquet.open_columns(args.file_path, locs + weight, rectype)
+    if data is not None:
+        blocks = [data]
+        rectype = None
+    else:
+        # A gzipped file is crosstabulated a block of records at a time
+        blocks = data_blocks(args.file_path)
+    partials = []
+    n = 0
+    for data in blocks:
+        if rectype is not None:
+            data = data.subset(data.rectype_mask(*rectype))
+        weights = None
+        if args.ws is not None:
+            weights = data.column(args.ws, args.ww).astype(np.float64)
+        partials.append(crosstab(data, locs, weights))
+        n += len(data)
+    if len(partials) == 1:
+        values, cells, counts = partials[0]
+    else:
+        values, cells, counts = merge_crosstabs(partials)
+    if args.ws is not None:
+        counts = counts / args.wd
+    return values, cells, counts, n
+
+
+def labels(values, quote):
+    labels = np.char.decode(values, "latin-1").tolist()
+    if quote:
+        labels = [f"'{label}'" for label in labels]
+    return labels
+
+
+def long_frame(values, cells, counts, quote):
+    columns = {
+        f"column_{i}": np.array(labels(v, quote), dtype=object)[cells[:, i]]
+        for i, v in enumerate(values)
+    }
+    columns["Frequency"] = counts
+    return pd.DataFrame(columns)
+
+
+def table_frame(values, table, quote):
+    return pd.DataFrame(
+        table,
+        index=pd.Index(labels(values[0], quote) + ["*TOT*"], name="column_0"),
+        columns=pd.Index(labels(values[1], quote) + ["*TOT*"], name="column_1"),
     )
-    os.remove("crosstab_output.csv")
+
+
+def print_crosstab(values, cells, counts, args):
+    if args.long:
+        print(long_frame(values, cells, counts, args.q).to_string(index=False))
+    elif len(values) == 2:
+        print(table_frame(values, table(values, cells, counts), args.q))
+    else:
+        for key, sliced in slices(values, cells, counts):
+            names = range(2, len(values))
+            key = labels(np.array(key), args.q)
+            print(", ".join(f"column_{i} = {k}" for i, k in zip(names, key)))
+            print(table_frame(values, sliced, args.q))
+            print()
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    sw = args.starts_and_widths
+    if len(sw) < 4 or len(sw) % 2:
+        parser.error("starts_and_widths must be an even number of at least 4 values")
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache("cross_quick")
+        key = cache.key(
+            data=file_fingerprint(args.file_path),
+            columns=args.starts_and_widths,
+            rectype=[args.rectype, args.s, args.w],
+            weight=[args.ws, args.ww, args.wd],
+            layout="cells",
+        )
+        cached = cache.get(key)
+    if cache is not None and cached is not None:
+        values, cells, counts, n = cached
+    else:
+        values, cells, counts, n = run_crosstab(args)
+        if cache is not None:
+            cache.put(key, (values, cells, counts, n))
+    if args.v:
+        print(f"File: {args.file_path}")
+        print(f"Record type: {args.rectype or 'all records'}")
+        print(f"Lines examined: {n}")
+    print_crosstab(values, cells, counts, args)
 
 
 if __name__ == "__main__":
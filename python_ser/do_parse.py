@@ -1,8 +1,7 @@
 import re
-import polars as pl
+from ipums.tools.statfile_dd import build_dd, cached_parse, write_dd
 from itertools import chain
 import argparse
-import sys
 
 
 class DataList:
@@ -21,27 +20,6 @@ class DataList:
     def set_rt(self, new_rt):
         self.rectype = new_rt
 
-    def to_df(self):
-        head_line = [
-            (
-                self.rectype,
-                self.name.lower(),
-                str(self.start),
-                str(int(self.end) - int(self.start) + 1) if self.end else "1",
-                self.fmt if self.fmt else "",
-                "",
-                self.label,
-                "",
-                self.label,
-                "",
-            )
-        ]
-
-        return pl.DataFrame(
-            head_line + self.valuelabels if self.valuelabels else head_line,
-            orient="row",
-        )
-
     def set_fmt(self, new_fmt):
         self.fmt = new_fmt
 
@@ -115,134 +93,124 @@ The parser ignores the following:
         action="store_true",
         help="Depricated. File does not deliniate between Stat Transfer files and non Stat Transfer files.",
     )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Write the data dictionary to this file instead of standard output: Excel if it ends in .xlsx, Parquet if it ends in .parquet, otherwise tab-delimited",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="Always parse the syntax file, ignoring and not saving cached results",
+    )
     return parser
 
 
 def build_df(dl):
-    df = pl.concat([d.to_df() for d in dl])
-    df.columns = [
-        "RecordType",
-        "Var",
-        "Col",
-        "Wid",
-        "Frm",
-        "Value",
-        "VarLabel",
-        "ValueLabel",
-        "VarLabelOrig",
-        "ValueLabelOrig",
-    ]
-    empty_cols_1 = pl.DataFrame(
-        {
-            "Freq": [],
-            "Sel": [],
-            "Notes": [],
-            "Svar": [],
-            "ValueSvar": [],
-        },
-        schema={
-            "Freq": pl.Utf8,
-            "Sel": pl.Utf8,
-            "Notes": pl.Utf8,
-            "Svar": pl.Utf8,
-            "ValueSvar": pl.Utf8,
-        },
-    )
-    df2 = df.select(
-        pl.col("VarLabelOrig").alias("VarLabelSvar"),
-        pl.col("ValueLabelOrig").alias("ValueLabelSvar"),
-    )
-    empty_cols_2 = pl.DataFrame(
-        {
-            "UnivSvar": [],
-            "NoRec": [],
-            "NonTab": [],
-            "Hide": [],
-            "Decim": [],
-            "String": [],
-            "CommP": [],
-            "CodeTy": [],
-            "DDoc1": [],
-            "Dtag1": [],
-            "JDoc1": [],
-            "JTag1": [],
-            "DDoc2": [],
-            "DTag2": [],
-            "JDoc2": [],
-            "JTag2": [],
-        },
-        schema={
-            "UnivSvar": pl.Utf8,
-            "NoRec": pl.Utf8,
-            "NonTab": pl.Utf8,
-            "Hide": pl.Utf8,
-            "Decim": pl.Utf8,
-            "String": pl.Utf8,
-            "CommP": pl.Utf8,
-            "CodeTy": pl.Utf8,
-            "DDoc1": pl.Utf8,
-            "Dtag1": pl.Utf8,
-            "JDoc1": pl.Utf8,
-            "JTag1": pl.Utf8,
-            "DDoc2": pl.Utf8,
-            "DTag2": pl.Utf8,
-            "JDoc2": pl.Utf8,
-            "JTag2": pl.Utf8,
-        },
-    )
-    return pl.concat([df, empty_cols_1, df2, empty_cols_2], how="horizontal")
+    return build_dd(dl)
+
+
+class DoFileSections:
+    """Collects the sections of a .do file one line at a time.
+
+    Each line is dispatched on its leading keyword (or on being indented, for
+    the variables of an infix statement) to the one pattern that can match
+    it. Variables are indexed by name once their rectype is known, so
+    formats set by later replace statements are applied without a search.
+    """
+
+    PATTERNS = {
+        "": re.compile(r"\s+(\w+)\s+(\w+)\s+(\d+)-(\d+)\s+"),
+        "drop": re.compile(r"drop if rectype != `\"(.)\""),
+        "replace": re.compile(r"replace (\w+)\s+=\s+(\w+)\s+\/\s(\w+)"),
+        "label var": re.compile(r"label var (\w+)\s+`\"(.+)\""),
+        "label define": re.compile(r"label define (\w+)\s+(-*\d+)\s+`\"(.+)\""),
+        "label values": re.compile(r"label values (\w+)\s+(\w+)"),
+    }
+
+    def __init__(self):
+        self.data_list = []
+        self.rectype_chunk = []
+        self.var_labels = {}
+        self.val_labels = {}
+        self.by_name = {}
+        self.handlers = {
+            "": self.infix_var,
+            "drop": self.drop_rectype,
+            "replace": self.replace_format,
+            "label var": self.label_var,
+            "label define": self.label_define,
+            "label values": self.label_values,
+        }
+
+    @staticmethod
+    def keyword(line):
+        if line[:1].isspace():
+            return ""
+        words = line.split(None, 2)
+        if not words:
+            return None
+        if words[0] == "label" and len(words) > 1:
+            return "label " + words[1]
+        return words[0]
+
+    def parse_line(self, line):
+        key = self.keyword(line)
+        pattern = self.PATTERNS.get(key)
+        if pattern is not None and (m := pattern.match(line)):
+            self.handlers[key](m)
+
+    def extend_data_list(self, chunk):
+        self.data_list.extend(chunk)
+        for dl in chunk:
+            self.by_name.setdefault(dl.name, []).append(dl)
+
+    def infix_var(self, m):
+        fmt = "a" if m.group(1) == "str" else None
+        self.rectype_chunk.append(
+            DataList(".", m.group(2), m.group(3), m.group(4), fmt)
+        )
+
+    def drop_rectype(self, m):
+        for dl in self.rectype_chunk:
+            dl.set_rt(m.group(1))
+        self.extend_data_list(self.rectype_chunk)
+        self.rectype_chunk = []
+
+    def replace_format(self, m):
+        for dl in self.by_name.get(m.group(1), []):
+            dl.set_fmt(str(m.group(3).count("0")))
+
+    def label_var(self, m):
+        self.var_labels[m.group(1)] = m.group(2)
+
+    def label_define(self, m):
+        self.val_labels.setdefault(m.group(1), []).append((m.group(2), m.group(3)))
+
+    def label_values(self, m):
+        labels = self.val_labels.pop(m.group(2))
+        self.val_labels[m.group(1)] = [
+            ValueLabel(m.group(1), value, label).to_row() for value, label in labels
+        ]
+
+    def finish(self):
+        if len(self.rectype_chunk) > 0:
+            self.extend_data_list(self.rectype_chunk)
+            self.rectype_chunk = []
+        return {
+            "DataList": self.data_list,
+            "VarLabels": self.var_labels,
+            "ValueLabels": self.val_labels,
+        }
 
 
 def build_file_sections(filename):
-    data_list = []
-    rectype_chunk = []
-    var_labels = {}
-    val_labels = {}
+    sections = DoFileSections()
     with open(filename, "r") as f:
-        while True:
-            line = f.readline()
-            if line:
-                if m := re.match(r"\s+(\w+)\s+(\w+)\s+(\d+)-(\d+)\s+", line):
-                    if m.group(1) == "str":
-                        rectype_chunk.append(
-                            DataList(".", m.group(2), m.group(3), m.group(4), "a")
-                        )
-                    else:
-                        rectype_chunk.append(
-                            DataList(".", m.group(2), m.group(3), m.group(4), None)
-                        )
-                elif m := re.match(r"drop if rectype != `\"(.)\"", line):
-                    set_rectypes = [dl.set_rt(m.group(1)) for dl in rectype_chunk]
-                    data_list.extend(rectype_chunk)
-                    rectype_chunk = []
-                elif m := re.match(r"replace (\w+)\s+=\s+(\w+)\s+\/\s(\w+)", line):
-                    indices = [
-                        i
-                        for i in range(len(data_list))
-                        if data_list[i].name == m.group(1)
-                    ]
-                    for idx in indices:
-                        data_list[idx].set_fmt(str(m.group(3).count("0")))
-                elif m := re.match(r"label var (\w+)\s+`\"(.+)\"", line):
-                    var_labels[m.group(1)] = m.group(2)
-                elif m := re.match(r"label define (\w+)\s+(-*\d+)\s+`\"(.+)\"", line):
-                    if m.group(1) not in val_labels:
-                        val_labels[(m.group(1))] = [(m.group(2), m.group(3))]
-                    else:
-                        val_labels[m.group(1)].append((m.group(2), m.group(3)))
-                elif m := re.match(r"label values (\w+)\s+(\w+)", line):
-                    val_labels[m.group(1)] = val_labels.pop(m.group(2))
-                    val_labels[m.group(1)] = list(
-                        map(
-                            lambda vl: ValueLabel(m.group(1), vl[0], vl[1]).to_row(),
-                            val_labels[m.group(1)],
-                        )
-                    )
-            else:
-                if len(rectype_chunk) > 0:
-                    data_list.extend(rectype_chunk)
-                break
-    return {"DataList": data_list, "VarLabels": var_labels, "ValueLabels": val_labels}
+        for line in f:
+            sections.parse_line(line)
+    return sections.finish()
 
 
 def zipper(file_secs):
@@ -258,13 +226,17 @@ def zipper(file_secs):
             pass
 
 
+def parse(filename):
+    """The variables of a do file, with their labels attached."""
+    file_sections = build_file_sections(filename)
+    zipper(file_sections)
+    return file_sections["DataList"]
+
+
 def main():
     parser = build_parser()
     args = parser.parse_args()
-    file_sections = build_file_sections(args.filename)
-    zipper(file_sections)
-    df = build_df(file_sections["DataList"])
-    print(df.write_csv(file=None, separator="\t"), file=sys.stdout)
+    write_dd(cached_parse(parse, args.filename, args.no_cache), args.output)
 
 
 if __name__ == "__main__":
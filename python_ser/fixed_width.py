@@ -0,0 +1,234 @@
+import gzip
+import mmap
+import numpy as np
+from ipums.tools.gzip_index import read_gzip
+
+NEWLINE = ord("\n")
+CARRIAGE_RETURN = ord("\r")
+# Bytes scanned per step when locating newlines, to bound the temporary mask
+SCAN_CHUNK = 1 << 26
+
+
+class FixedWidthFile:
+    """Records of a fixed-width data file, held as one flat NumPy byte array.
+
+    Uncompressed files are memory-mapped rather than read, and gzipped files
+    are decompressed into memory, with up to `jobs` processes inflating the
+    members of multi-member files in parallel. Record boundaries are found with a single
+    vectorized newline scan, so columns can be pulled out for every record at
+    once without building a Python string per line. Trailing carriage returns
+    are not counted as part of a record. A byte_range limits the object to
+    part of the file, and should start and end on record boundaries.
+    """
+
+    def __init__(
+        self,
+        data_source=None,
+        buf=None,
+        starts=None,
+        lengths=None,
+        jobs=None,
+        byte_range=None,
+    ):
+        self.data_source = data_source
+        self._mmap = None
+        if buf is None:
+            buf = self.__load(data_source, jobs)
+        if byte_range is not None:
+            buf = buf[byte_range[0] : byte_range[1]]
+        self.buf = buf
+        if starts is None:
+            starts, lengths = find_records(buf)
+        self.starts = starts
+        self.lengths = lengths
+        self._stride = False
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(buf=np.frombuffer(data, dtype=np.uint8))
+
+    def __load(self, data_source, jobs):
+        if str(data_source).endswith(".gz"):
+            return np.frombuffer(read_gzip(data_source, jobs), dtype=np.uint8)
+        with open(data_source, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                return np.empty(0, dtype=np.uint8)
+        return np.frombuffer(self._mmap, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.buf = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Column views are still alive; the map closes once they go
+                pass
+            self._mmap = None
+
+    def subset(self, rows):
+        """Return the records selected by a boolean mask or index array.
+
+        The new object shares this file's byte array.
+        """
+        return FixedWidthFile(
+            self.data_source, self.buf, self.starts[rows], self.lengths[rows]
+        )
+
+    def record(self, i):
+        start = self.starts[i]
+        return bytes(self.buf[start : start + self.lengths[i]])
+
+    def records(self):
+        for start, length in zip(self.starts.tolist(), self.lengths.tolist()):
+            yield bytes(self.buf[start : start + length])
+
+    def stride(self):
+        """The distance between consecutive records, or None if it varies."""
+        if self._stride is False:
+            self._stride = None
+            if len(self.starts) > 1:
+                steps = np.diff(self.starts)
+                if (steps == steps[0]).all():
+                    self._stride = int(steps[0])
+        return self._stride
+
+    def column(self, start, width):
+        """One (1-indexed start, width) column as a fixed-size bytes array.
+
+        When every record is the same distance apart this is a zero-copy
+        strided view of the underlying buffer.
+        """
+        self.__check_range([(start, width)])
+        stride = self.stride()
+        if stride is not None:
+            return np.ndarray(
+                shape=(len(self),),
+                dtype=f"S{width}",
+                buffer=self.buf,
+                offset=int(self.starts[0]) + start - 1,
+                strides=(stride,),
+            )
+        return self.columns([(start, width)])
+
+    def columns(self, locs):
+        """Concatenate several (start, width) columns into one fixed-size
+        bytes value per record.
+
+        The values are filled in one byte offset at a time, so the only
+        temporary is one index per record; when every record is the same
+        distance apart not even that, and a single column is the zero-copy
+        view from column().
+        """
+        self.__check_range(locs)
+        stride = self.stride()
+        if stride is not None and len(locs) == 1:
+            return self.column(*locs[0])
+        offsets = column_offsets(locs)
+        matrix = np.empty((len(self), len(offsets)), dtype=np.uint8)
+        for j, offset in enumerate(offsets.tolist()):
+            if stride is not None:
+                first = int(self.starts[0]) + offset
+                matrix[:, j] = self.buf[first::stride][: len(self)]
+            else:
+                matrix[:, j] = self.buf[self.starts + offset]
+        return matrix.view(f"S{len(offsets)}").ravel()
+
+    def rectype_mask(self, value, start=1, width=1):
+        """Boolean mask of the records whose rectype column equals value.
+
+        Records too short to hold the rectype column never match.
+        """
+        if isinstance(value, str):
+            value = value.encode()
+        fits = self.lengths >= start + width - 1
+        mask = np.zeros(len(self), dtype=bool)
+        if fits.any():
+            rectypes = self.subset(fits).columns([(start, width)])
+            mask[fits] = rectypes == value
+        return mask
+
+    def __check_range(self, locs):
+        needed = max(int(s) + int(w) - 1 for s, w in locs)
+        short = self.lengths < needed
+        if short.any():
+            line = int(np.flatnonzero(short)[0])
+            raise ValueError(
+                "Attempted to index out of range. Line is of length "
+                + f"{self.lengths[line]}, but columns {locs} were requested."
+            )
+
+
+def find_records(buf):
+    """Offsets and lengths of the newline-delimited records in buf."""
+    ends = np.concatenate(
+        [np.empty(0, dtype=np.int64)]
+        + [
+            np.flatnonzero(buf[i : i + SCAN_CHUNK] == NEWLINE) + i
+            for i in range(0, len(buf), SCAN_CHUNK)
+        ]
+    )
+    if len(buf) and buf[-1] != NEWLINE:
+        ends = np.append(ends, len(buf))
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts
+    crlf = lengths > 0
+    crlf[crlf] = buf[ends[crlf] - 1] == CARRIAGE_RETURN
+    lengths[crlf] -= 1
+    return starts, lengths
+
+
+def column_offsets(locs):
+    """Zero-indexed byte offsets covered by a list of (start, width) pairs."""
+    return np.concatenate([np.arange(int(s) - 1, int(s) - 1 + int(w)) for s, w in locs])
+
+
+def record_blocks(f, block_size=SCAN_CHUNK):
+    """Read a binary stream as FixedWidthFiles of whole records."""
+    pending = b""
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        block = pending + block
+        end = block.rfind(b"\n") + 1
+        pending = block[end:]
+        if end:
+            yield FixedWidthFile.from_bytes(block[:end])
+    if pending:
+        yield FixedWidthFile.from_bytes(pending)
+
+
+def data_blocks(data_source, block_size=SCAN_CHUNK):
+    """The records of a data file as FixedWidthFiles, to be processed one
+    at a time.
+
+    An uncompressed file is memory-mapped and comes as one block. A gzipped
+    file is streamed in blocks of whole records, so it is never inflated
+    into memory all at once. At least one block, possibly empty, is always
+    yielded.
+    """
+    if not str(data_source).endswith(".gz"):
+        with FixedWidthFile(data_source) as data:
+            yield data
+        return
+    empty = True
+    with gzip.open(data_source, "rb") as f:
+        for data in record_blocks(f, block_size):
+            empty = False
+            yield data
+    if empty:
+        yield FixedWidthFile.from_bytes(b"")
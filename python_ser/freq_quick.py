@@ -1,9 +1,15 @@
 import argparse
+import mmap
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import subprocess
 import os
 import sys
+import numpy as np
+import polars as pl
 from ipums.tools.local_lib import utils
+from ipums.tools.fixed_width import SCAN_CHUNK, FixedWidthFile, data_blocks
+from ipums.tools import gzip_index, fw_to_parquet
+from ipums.tools.result_cache import ResultCache, file_fingerprint
 
 from ipums.metadata import Variables, DataDictionary, Samples
 
@@ -16,6 +22,7 @@ class FreqQuick(object):
         self.opts = parsed_args["opts"]
         self.passthru = parsed_args["passthru"]
         self.locs = []
+        self.names = []
         if self.opts.project:
             self.variables = Variables(self.opts.project)
             self.samples = Samples(self.opts.project)
@@ -31,6 +38,7 @@ class FreqQuick(object):
             self.locs.extend(
                 [self.variable_loc(var.upper()) for var in self.opts.variable_names]
             )
+            self.names.extend([var.upper() for var in self.opts.variable_names])
         if self.opts.svar or self.opts.wsvar:
             svar_sample = self.validate_svars()
             if self.sample:
@@ -50,10 +58,11 @@ class FreqQuick(object):
             else:
                 # Don't need to find sample and need to append to opts.svar
                 svars = [self.dd.var_to_svar(ovar) for ovar in self.opts.ovar]
-                self.opts.svar = self.opts.svar.append(svars)
+                self.opts.svar.extend(svars)
         if self.opts.svar:
             svar_locs = [self.svar_loc(svar.upper()) for svar in self.opts.svar]
             self.locs.extend(svar_locs)
+            self.names.extend(self.opts.svar)
         if hasattr(self, "rectype"):
             self.__addpassthru("-r", self.rectype)
         if self.opts.wsvar or self.opts.wvar or self.opts.wovar:
@@ -77,6 +86,16 @@ class FreqQuick(object):
             if d["REC"] != self.rectype:
                 raise AssertionError("Weight not of rectype " + self.rectype)
             self.__resolve_weight_divisor(d)
+        self.fw = passthru_parser().parse_intermixed_args(
+            [str(x) for x in self.passthru]
+        )
+        # bare start/width pairs are passed straight through, as with the binary
+        pairs = self.fw.starts_and_widths
+        if len(pairs) % 2 != 0:
+            raise AssertionError("Unequal number of variable starts and widths given")
+        for start, wid in zip(pairs[::2], pairs[1::2]):
+            self.locs.append((start, wid))
+            self.names.append(f"{start}_{wid}")
 
     def __addpassthru(self, flag, value):
         self.passthru.insert(0, value)
@@ -137,32 +156,376 @@ class FreqQuick(object):
             }
         return (d["start"], d["wid"])
 
+    def count(self, groups):
+        """Count every group of locations over the records that pass the
+        rectype filter, splitting the work over --jobs processes.
+
+        Counts are cached on disk against the data file's fingerprint and
+        the locations counted, unless --no-cache is given.
+
+        Returns one (values, frequencies) pair per group.
+        """
+        fw = self.fw
+        spec = (
+            groups,
+            (fw.rectype, fw.s, fw.w) if fw.rectype is not None else None,
+            (fw.ws, fw.ww) if fw.ws is not None else None,
+        )
+        cache = None
+        if not self.opts.no_cache:
+            cache = ResultCache("freq_quick", self.opts.cache_size)
+            key = cache.key(data=file_fingerprint(self.opts.data_source), spec=spec)
+            cached = cache.get(key)
+        if cache is not None and cached is not None:
+            self.lines_examined, counts = cached
+        else:
+            self.lines_examined, counts = count_data_file(
+                self.opts.data_source, spec, self.opts.jobs
+            )
+            if cache is not None:
+                cache.put(key, (self.lines_examined, counts))
+        if fw.ws is None:
+            return counts
+        return [(values, sums / fw.wd) for values, sums in counts]
+
+    def compute(self):
+        """Collect the frequency table in-process.
+
+        Returns a DataFrame with one column per requested location
+        (column_0, column_1, ...) and a Frequency column, sorted by value.
+        """
+        [(values, freqs)] = self.count([self.locs])
+        return to_frame(values, freqs, [int(s[1]) for s in self.locs])
+
+    def compute_separately(self, joint=False):
+        """Collect an independent frequency table for every requested
+        location from a single read of the data file.
+
+        Returns a dict of variable name to DataFrame. With joint=True the
+        table of the concatenated values is included under "joint".
+        """
+        groups = [[loc] for loc in self.locs]
+        names = list(self.names)
+        if joint:
+            groups.append(self.locs)
+            names.append("joint")
+        tables = {}
+        for name, locs, (values, freqs) in zip(names, groups, self.count(groups)):
+            tables[name] = to_frame(values, freqs, [int(s[1]) for s in locs])
+        return tables
+
+    def format_table(self, df):
+        if self.fw.q:
+            df = df.with_columns(
+                pl.format("'{}'", pl.col(c)).alias(c) for c in df.columns[:-1]
+            )
+        if self.fw.nf:
+            df = df.drop("Frequency")
+        return df
+
+    def write_separately(self):
+        out_dir = Path(self.opts.out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        tables = self.compute_separately(joint=self.opts.joint)
+        for name, df in tables.items():
+            df = self.format_table(df)
+            if self.opts.format == "parquet":
+                df.write_parquet(out_dir / f"{name}.parquet")
+            else:
+                df.write_csv(out_dir / f"{name}.tsv", separator="\t")
+            if self.fw.v:
+                print(f"{name}: {df.height} unique values -> {out_dir}")
+
     def run(self):
-        rust_exec = "/pkg/ipums/programming/bin/freq_quick"
-        # perl_exec = '/home/benklaas/git/mpc-script-emporium/freq.quick.pl'
-        locations = [s[0] for s in self.locs]
-        locations = []
-        for s in self.locs:
-            locations.append(str(s[0]))
-            locations.append(str(s[1]))
-        rust_call = [rust_exec, self.opts.data_source]
-        rust_call.extend(locations)
-        rust_call.extend([str(x) for x in self.passthru])
-        subprocess.call(rust_call)
+        if self.opts.separately:
+            self.write_separately()
+            return
+        fw = self.fw
+        df = self.compute()
+        if fw.v:
+            print("File: " + str(self.opts.data_source))
+            for s in self.locs:
+                print(f"Start -- Width: {s[0]} -- {s[1]}")
+            print("Record type: " + (fw.rectype or "all records"))
+            print(f"Record type start: {fw.s}")
+            print(f"Record type width: {fw.w}")
+            for label, value in (
+                ("start", fw.ws),
+                ("width", fw.ww),
+                ("divisor", fw.wd),
+            ):
+                print(f"Weight {label}: " + (str(value) if fw.ws else "unweighted"))
+            print(f"Lines examined: {self.lines_examined}")
+            print(f"Unique values: {df.height}")
+        df = self.format_table(df)
+        sys.stdout.write(df.write_csv(separator="\t", include_header=False))
+
+
+def passthru_parser():
+    """Parser for the freq_quick_rust.rs flags that FreqQuick passes through."""
+    parser = argparse.ArgumentParser(prog="freq_quick", add_help=False)
+    parser.add_argument("starts_and_widths", nargs="*", type=int)
+    parser.add_argument("-r", dest="rectype")
+    parser.add_argument("-s", type=int, default=1)
+    parser.add_argument("-w", type=int, default=1)
+    parser.add_argument("-ws", type=int)
+    parser.add_argument("-ww", type=int, default=1)
+    parser.add_argument("-wd", type=float, default=1)
+    parser.add_argument("-q", action="store_true")
+    parser.add_argument("-v", action="store_true")
+    parser.add_argument("--nf", action="store_true")
+    return parser
+
+
+def count_data_file(data_source, spec, jobs=1):
+    """Count a data file in shards, one per worker, and merge the results.
+
+    spec is (groups, rectype, weight): a list of location lists to count,
+    an optional (value, start, width) rectype filter and an optional
+    (start, width) weight column. Returns the number of records counted and
+    one merged (values, counts or weight sums) pair per group.
+
+    A current columnar copy written by fw_to_parquet is read instead of the
+    data file when it holds every location needed.
+    """
+    groups, rectype, weight = spec
+    locs = [loc for group in groups for loc in group] + ([weight] if weight else [])
+    columns = fw_to_parquet.open_columns(data_source, locs, rectype)
+    if columns is not None:
+        return count_records(columns, (groups, None, weight))
+    jobs = jobs or os.cpu_count()
+    if jobs == 1:
+        return count_blocks(data_source, spec)
+    if str(data_source).endswith(".gz"):
+        members = gzip_index.member_index(data_source, jobs)
+        if len(members) < 2:
+            return count_blocks(data_source, spec)
+        shards = [("gzip", data_source, group) for group in split(members, jobs)]
+    else:
+        shards = [
+            ("file", data_source, byte_range)
+            for byte_range in shard_ranges(data_source, jobs)
+        ]
+    if not shards:
+        return count_records(FixedWidthFile.from_bytes(b""), spec)
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        results = list(pool.map(count_shard, shards, [spec] * len(shards)))
+    partials = [result[:2] for result in results]
+    if shards[0][0] == "gzip":
+        # Records that straddle two shards come back as pieces to rejoin
+        data = FixedWidthFile.from_bytes(stitch([result[2] for result in results]))
+        partials.append(count_records(data, spec))
+    return merge_partials(partials, spec)
+
+
+def count_blocks(data_source, spec):
+    """Count a data file in one process, a block of records at a time, so a
+    gzipped file is never inflated into memory all at once."""
+    total = None
+    for data in data_blocks(data_source):
+        counted = count_records(data, spec)
+        total = counted if total is None else merge_partials([total, counted], spec)
+    return total
+
+
+def shard_ranges(path, jobs):
+    """Split a file into up to `jobs` byte ranges that end on newlines."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    bounds = [0]
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, jobs):
+                pos = mm.find(b"\n", max(size * i // jobs, bounds[-1]))
+                bounds.append(size if pos == -1 else pos + 1)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def split(items, parts):
+    """Split a list into up to `parts` contiguous, similarly sized pieces."""
+    n = len(items)
+    return [
+        items[i * n // parts : (i + 1) * n // parts]
+        for i in range(parts)
+        if (i + 1) * n // parts > i * n // parts
+    ]
+
+
+def count_shard(shard, spec):
+    """Count one shard in a worker process.
+
+    File shards are newline-aligned byte ranges of an uncompressed file.
+    Gzip shards are runs of members, whose first and last partial records
+    are returned as (head, tail) for the parent to rejoin.
+    """
+    kind, path, where = shard
+    if kind == "file":
+        return count_records(FixedWidthFile(path, byte_range=where), spec)
+    counter = ShardCounter(spec)
+    for offset in where:
+        gzip_index.walk_member(path, offset, counter.feed)
+    return counter.result()
+
+
+class ShardCounter:
+    """Counts the records of a gzip shard as its members are inflated.
+
+    Inflated data is fed in pieces and counted once SCAN_CHUNK bytes have
+    built up, a block of whole records at a time, into a running total. The
+    partial record before the shard's first newline is kept as the head and
+    the one after its last newline as the tail.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.total = count_records(FixedWidthFile.from_bytes(b""), spec)
+        self.head = None
+        self.pieces = []
+        self.size = 0
+
+    def feed(self, data):
+        self.pieces.append(data)
+        self.size += len(data)
+        if self.size >= SCAN_CHUNK:
+            self.flush()
+
+    def flush(self):
+        data = b"".join(self.pieces)
+        start = 0
+        if self.head is None:
+            first = data.find(b"\n")
+            if first == -1:
+                self.pieces = [data]
+                return
+            self.head = data[: first + 1]
+            start = first + 1
+        last = data.rfind(b"\n")
+        if last >= start:
+            body = FixedWidthFile.from_bytes(data[start : last + 1])
+            counted = count_records(body, self.spec)
+            self.total = merge_partials([self.total, counted], self.spec)
+        tail = data[max(last + 1, start) :]
+        self.pieces = [tail]
+        self.size = len(tail)
+
+    def result(self):
+        """(records, counts, pieces), pieces being (head, tail) or, when
+        the shard held no newline, (data,)."""
+        self.flush()
+        n, counts = self.total
+        if self.head is None:
+            return n, counts, (self.pieces[0],)
+        return n, counts, (self.head, self.pieces[0])
+
+
+def stitch(pieces):
+    """Rejoin the records split across gzip shards.
+
+    Each shard contributes (head, tail), or (data,) when it held no newline
+    at all.
+    """
+    lines = []
+    pending = b""
+    for piece in pieces:
+        if len(piece) == 1:
+            pending += piece[0]
+            continue
+        head, tail = piece
+        lines.append(pending + head)
+        pending = tail
+    lines.append(pending)
+    return b"".join(lines)
+
+
+def count_records(data, spec):
+    groups, rectype, weight = spec
+    if rectype is not None:
+        data = data.subset(data.rectype_mask(*rectype))
+    weights = None
+    if weight is not None:
+        weights = data.column(*weight).astype(np.float64)
+    return len(data), [count_columns(data, locs, weights) for locs in groups]
+
+
+def count_columns(data, locs, weights=None):
+    """Count the values of a group of locations.
+
+    A single column of a columnar copy is counted from its dictionary codes,
+    without sorting its values.
+    """
+    if isinstance(data, fw_to_parquet.ColumnarFile) and len(locs) == 1:
+        encoded = data.codes(*locs[0])
+        if encoded is not None:
+            values, codes = encoded
+            present = np.bincount(codes, minlength=len(values)) > 0
+            counts = np.bincount(codes, weights=weights, minlength=len(values))
+            # Dictionary values are written sorted, as np.unique returns them
+            return values[present], counts[present]
+    return count_keys(data.columns(locs), weights)
+
+
+def count_keys(keys, weights=None):
+    """Distinct keys with their counts, or their summed weights."""
+    if weights is None:
+        return np.unique(keys, return_counts=True)
+    values, inverse = np.unique(keys, return_inverse=True)
+    return values, np.bincount(inverse.ravel(), weights=weights)
+
+
+def merge_partials(partials, spec):
+    """Merge the (records, counts) of several parts of a file into one."""
+    n = sum(p[0] for p in partials)
+    merged = [merge_counts([p[1][i] for p in partials]) for i in range(len(spec[0]))]
+    return n, merged
+
+
+def merge_counts(partials):
+    """Merge (values, counts) pairs from several shards into one."""
+    values, inverse = np.unique(
+        np.concatenate([p[0] for p in partials]), return_inverse=True
+    )
+    sums = np.concatenate([p[1] for p in partials])
+    merged = np.bincount(inverse.ravel(), weights=sums, minlength=len(values))
+    return values, merged.astype(sums.dtype)
+
+
+def tabulate(keys, widths, weights=None, divisor=1):
+    """Count (or sum the weights of) each distinct key, splitting the keys
+    back out into one column per width."""
+    values, freqs = count_keys(keys, weights)
+    if weights is not None:
+        freqs = freqs / divisor
+    return to_frame(values, freqs, widths)
+
+
+def to_frame(values, freqs, widths):
+    # S dtypes drop trailing NUL padding, so view through a fixed-width matrix
+    matrix = values.astype(f"S{sum(widths)}").view(np.uint8)
+    matrix = matrix.reshape(len(values), sum(widths))
+    cols = {}
+    offset = 0
+    for i, w in enumerate(widths):
+        col = np.ascontiguousarray(matrix[:, offset : offset + w]).view(f"S{w}")
+        cols[f"column_{i}"] = np.char.decode(col.ravel(), "latin-1")
+        offset += w
+    cols["Frequency"] = freqs
+    return pl.DataFrame(cols)
 
 
 def parse_and_check_args():
     parser = argparse.ArgumentParser(
         description="Freq Quick: This program \
-        constructs a call to freq_quick_rust.rs based on current project \
-        metadata, deriving column start and width pairs for the \
+        collects frequencies from a fixed-width data file based on current \
+        project metadata, deriving column start and width pairs for the \
         provided integrated variable or svar names and then returns \
         the result to the screen. \
         If multiple integrated or source variables are given frequencies \
         will be collected on the concatenated values. \
-        This program will also pass through any freq_quick_rust.rs arguments not \
-        listed below. You can see the help documentation for freq_quick_rust.rs \
-        by calling `freq_quick_rust.rs -h`"
+        This program also accepts the freq_quick_rust.rs arguments not \
+        listed below (-r, -w, -ws, -ww, -wd, -q, -v, --nf). You can see the help \
+        documentation for freq_quick_rust.rs by calling `freq_quick_rust.rs -h`"
     )
     parser.add_argument(
         "data_source",
@@ -209,6 +572,50 @@ def parse_and_check_args():
     )
     parser.add_argument("--debug", help=argparse.SUPPRESS, action="store_true")
 
+    batch = parser.add_argument_group("Batch arguments")
+    batch.add_argument(
+        "--separately",
+        action="store_true",
+        help="Collect a separate frequency table for every given variable \
+        in a single pass over the data file, writing one file per variable.",
+    )
+    batch.add_argument(
+        "--joint",
+        action="store_true",
+        help="With --separately, also write the table of the concatenated \
+        values as 'joint'.",
+    )
+    batch.add_argument(
+        "--out_dir",
+        default=".",
+        help="Directory to write --separately tables to (default: current directory)",
+    )
+    batch.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes to count the data file with (default: 1)",
+    )
+    batch.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="Always scan the data file, ignoring and not saving cached frequencies",
+    )
+    batch.add_argument(
+        "--cache_size",
+        type=float,
+        metavar="MB",
+        help="Size budget of the frequency cache in MB (default: $IPUMS_CLI_CACHE_MB or 512)",
+    )
+    batch.add_argument(
+        "--format",
+        choices=["tsv", "parquet"],
+        default="tsv",
+        help="File format of --separately tables (default: tsv)",
+    )
+
     # only one of wvar and wsvar
     weightvars = optional.add_mutually_exclusive_group()
     weightvars.add_argument(
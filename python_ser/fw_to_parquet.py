@@ -0,0 +1,319 @@
+import argparse
+import bisect
+import json
+import os
+from pathlib import Path
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ipums.tools.column_index import layout_from_dd
+from ipums.tools.fixed_width import FixedWidthFile
+from ipums.tools.result_cache import file_fingerprint
+
+from ipums.metadata import DataDictionary, Samples
+
+# Schema metadata key holding the layout of a converted file
+LAYOUT_KEY = b"ipums_fixed_width"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="fw_to_parquet",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""
+-----------------------
+Fixed-width to Parquet
+-----------------------
+This program writes a columnar copy of a fixed-width data file, with one
+Parquet file per record type and one dictionary-encoded column per variable
+location in the data dictionary.
+
+The copy is written next to the data file as <data file>.columns/ and is
+used automatically by freq_quick and cross_quick in place of the data file
+while it is newer than the data file. Columns are named <start>_<width>;
+a location that is not in the copy is still read from the data file.
+
+Output:
+    <data file>.columns/<record type>.parquet  (_all.parquet without record types)
+""",
+    )
+    parser.add_argument("data_file", help="Path to a fixed-width data file")
+    layout = parser.add_mutually_exclusive_group(required=True)
+    layout.add_argument(
+        "--dd",
+        help="Tab-delimited data dictionary, as written by statfile_parse",
+    )
+    layout.add_argument(
+        "-p", "--project", help="IPUMS project whose data dictionary to use"
+    )
+    parser.add_argument(
+        "--sample", help="Sample of the data file (default: found from its name)"
+    )
+    parser.add_argument(
+        "-s", type=int, default=1, help="Start column for record type variable"
+    )
+    parser.add_argument("-w", type=int, default=1, help="Width of record type variable")
+    parser.add_argument(
+        "-o",
+        "--out_dir",
+        help="Directory to write the copy to (default: <data file>.columns)",
+    )
+    parser.add_argument(
+        "-v", action="store_true", help="Print each file written with its size"
+    )
+    return parser
+
+
+def layout_from_tsv(path):
+    """(rectype, name, start, width) of every variable in a tab-delimited
+    data dictionary. Value label rows, which have no column, are skipped.
+
+    Rectangular files, which statfile_parse writes with a RecordType of ".",
+    get the rectype "" so that every record is copied.
+    """
+    df = pl.read_csv(path, separator="\t", infer_schema_length=0)
+    df = df.filter(pl.col("Var").is_not_null() & pl.col("Col").is_not_null())
+    return [
+        ("" if rt in (None, ".") else rt, var, int(col), int(wid))
+        for rt, var, col, wid in df.select("RecordType", "Var", "Col", "Wid").rows()
+    ]
+
+
+def columnar_dir(data_source):
+    return Path(str(data_source) + ".columns")
+
+
+def rectype_file(directory, rectype):
+    return Path(directory) / (f"{rectype}.parquet" if rectype else "_all.parquet")
+
+
+def convert(data_source, layout, rectype_loc=(1, 1), out_dir=None):
+    """Write one Parquet file per record type of the layout.
+
+    Records whose rectype is not in the layout are not copied. Returns the
+    paths written.
+    """
+    out_dir = Path(out_dir or columnar_dir(data_source))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    by_rectype = {}
+    for rectype, name, start, width in layout:
+        names = by_rectype.setdefault(rectype, {}).setdefault((start, width), [])
+        names.append(name)
+    written = []
+    with FixedWidthFile(data_source) as data:
+        for rectype, locs in by_rectype.items():
+            records = data
+            if rectype:
+                records = data.subset(data.rectype_mask(rectype, *rectype_loc))
+            table = pa.table(
+                {
+                    f"{start}_{width}": encode(records.column(start, width))
+                    for start, width in sorted(locs)
+                }
+            )
+            layout_meta = {
+                "rectype": rectype,
+                "rectype_loc": list(rectype_loc),
+                "names": {f"{s}_{w}": names for (s, w), names in locs.items()},
+                "source": file_fingerprint(data_source),
+                "records": len(data),
+            }
+            table = table.replace_schema_metadata(
+                {LAYOUT_KEY: json.dumps(layout_meta).encode()}
+            )
+            path = rectype_file(out_dir, rectype)
+            tmp = path.with_suffix(".tmp")
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+            written.append(path)
+    return written
+
+
+def encode(column):
+    """A fixed-size bytes column as an Arrow dictionary-encoded column."""
+    values, codes = np.unique(column, return_inverse=True)
+    return pa.DictionaryArray.from_arrays(
+        pa.array(codes.ravel().astype(np.int32)),
+        pa.array(values.tolist(), type=pa.binary()),
+    )
+
+
+def decode(column, width):
+    """An Arrow dictionary-encoded column as its distinct values, a
+    fixed-size bytes array, and each row's index into them."""
+    if column.num_chunks == 0:
+        return np.empty(0, dtype=f"S{width}"), np.empty(0, dtype=np.int32)
+    column = column.unify_dictionaries().combine_chunks()
+    values = np.array(column.dictionary.to_pylist(), dtype=f"S{width}")
+    indices = column.indices.to_numpy()
+    if (values[1:] < values[:-1]).any():
+        # Row groups were merged into one dictionary; keep it sorted
+        order = np.argsort(values)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        values, indices = values[order], rank[indices]
+    return values, indices
+
+
+def cover(stored, start, width):
+    """Pieces of the stored (start, width) columns that make up the
+    requested column, as (stored location, offset, length), or None if the
+    requested bytes are not all stored.
+
+    stored must be sorted.
+    """
+    pieces = []
+    pos = start
+    end = start + width
+    while pos < end:
+        i = bisect.bisect_right(stored, (pos, float("inf")))
+        candidates = [(s, w) for s, w in stored[:i] if s + w > pos]
+        if not candidates:
+            return None
+        s, w = max(candidates, key=lambda loc: loc[0] + loc[1])
+        length = min(end, s + w) - pos
+        pieces.append(((s, w), pos - s, length))
+        pos += length
+    return pieces
+
+
+def open_columns(data_source, locs, rectype=None):
+    """The requested columns from the columnar copy of a data file, or None
+    if there is no current copy holding all of them.
+
+    rectype is an optional (value, start, width) filter. The copy must be
+    newer than the data file, and without a rectype filter it must hold
+    every record of the data file.
+    """
+    locs = [(int(start), int(width)) for start, width in locs]
+    directory = columnar_dir(data_source)
+    if not directory.is_dir():
+        return None
+    mtime = os.stat(data_source).st_mtime_ns
+    chosen = []
+    rows = 0
+    for path in sorted(directory.glob("*.parquet")):
+        if path.stat().st_mtime_ns <= mtime:
+            return None
+        layout = json.loads(pq.read_schema(path).metadata[LAYOUT_KEY])
+        if rectype is not None:
+            value, start, width = rectype
+            if layout["rectype"] != value or layout["rectype_loc"] != [start, width]:
+                continue
+        chosen.append(path)
+        rows += pq.read_metadata(path).num_rows
+    if not chosen or (rectype is None and rows != layout["records"]):
+        return None
+    pieces = []
+    for path in chosen:
+        stored = sorted(
+            tuple(int(x) for x in name.split("_"))
+            for name in pq.read_schema(path).names
+        )
+        covers = {loc: cover(stored, *loc) for loc in locs}
+        if None in covers.values():
+            return None
+        needed = sorted({piece[0] for c in covers.values() for piece in c})
+        table = pq.read_table(path, columns=[f"{s}_{w}" for s, w in needed])
+        columns = {(s, w): decode(table.column(f"{s}_{w}"), w) for s, w in needed}
+        pieces.append(ColumnarFile(columns, table.num_rows, covers))
+    if len(pieces) == 1:
+        return pieces[0]
+    return ColumnarFile.concat(pieces)
+
+
+class ColumnarFile:
+    """Columns read from a columnar copy, with the column interface of
+    FixedWidthFile for any location made up of the columns read.
+
+    Columns are held dictionary-encoded, as (values, indices), until asked for.
+    """
+
+    def __init__(self, encoded, n, covers):
+        self.encoded = encoded
+        self.n = n
+        self.covers = covers
+        self.stored = {}
+
+    @classmethod
+    def concat(cls, parts):
+        locs = list(parts[0].covers)
+        encoded = {}
+        for loc in locs:
+            column = np.concatenate([p.column(*loc) for p in parts])
+            values, indices = np.unique(column, return_inverse=True)
+            encoded[loc] = (values, indices.ravel())
+        return cls(
+            encoded,
+            sum(len(p) for p in parts),
+            {loc: [(loc, 0, loc[1])] for loc in locs},
+        )
+
+    def __len__(self):
+        return self.n
+
+    def codes(self, start, width):
+        """(values, indices) of a whole stored column, or None."""
+        pieces = self.covers.get((int(start), int(width)))
+        if pieces is None or len(pieces) != 1 or pieces[0][2] != pieces[0][0][1]:
+            return None
+        return self.encoded[pieces[0][0]]
+
+    def __stored(self, loc):
+        if loc not in self.stored:
+            values, indices = self.encoded[loc]
+            self.stored[loc] = values[indices]
+        return self.stored[loc]
+
+    def column(self, start, width):
+        start, width = int(start), int(width)
+        pieces = self.covers.get((start, width))
+        if pieces is None:
+            pieces = cover(sorted(self.encoded), start, width)
+            if pieces is None:
+                raise KeyError(f"Columns {start} to {start + width - 1} were not read")
+        if len(pieces) == 1 and pieces[0][2] == pieces[0][0][1]:
+            # The whole of one stored column
+            return self.__stored(pieces[0][0])
+        matrix = np.empty((self.n, width), dtype=np.uint8)
+        pos = 0
+        for loc, offset, length in pieces:
+            stored = self.__stored(loc)
+            stored = stored.view(np.uint8).reshape(self.n, stored.itemsize)
+            matrix[:, pos : pos + length] = stored[:, offset : offset + length]
+            pos += length
+        return matrix.view(f"S{width}").ravel()
+
+    def columns(self, locs):
+        if len(locs) == 1:
+            return self.column(*locs[0])
+        total = sum(int(w) for _, w in locs)
+        matrix = np.empty((self.n, total), dtype=np.uint8)
+        pos = 0
+        for start, width in locs:
+            width = int(width)
+            column = self.column(start, width)
+            matrix[:, pos : pos + width] = column.view(np.uint8).reshape(self.n, width)
+            pos += width
+        return matrix.view(f"S{total}").ravel()
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.dd:
+        layout = layout_from_tsv(args.dd)
+    else:
+        sample = args.sample
+        if sample is None:
+            f = Path(args.data_file).name
+            sample = Samples(args.project).datafile_to_sample(f)
+            assert sample is not None, "Sample not found for " + f
+        layout = layout_from_dd(DataDictionary(sample, args.project))
+    for path in convert(args.data_file, layout, (args.s, args.w), args.out_dir):
+        if args.v:
+            print(f"{path}: {path.stat().st_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
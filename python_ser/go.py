@@ -2,8 +2,159 @@ import argparse
 import os
 import re
 import getpass
+import sqlite3
 from collections import OrderedDict
-from ipums.metadata import IPUMS
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+
+# A line of the go data file: KEY<tab>PATH
+GO_LINE = r"^\s*(.+)\t(.+)\s+$"
+
+
+class GoStore(MutableMapping):
+    """Go paths kept in a SQLite database, one row per key.
+
+    Every change is a transaction of its own, and SQLite's file locks make
+    concurrent shells wait for each other rather than overwrite each other's
+    changes. Keys are the table's primary key, whose index also serves
+    prefix lookups.
+
+    A new store is filled from legacy_file, a go data file, if one exists.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path, legacy_file=None, timeout=10.0):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        if self.__version() < self.SCHEMA_VERSION:
+            self.__create(legacy_file)
+
+    def __version(self):
+        return self.db.execute("PRAGMA user_version").fetchone()[0]
+
+    def __create(self, legacy_file):
+        with self.transaction():
+            # Another shell may have made the store while this one waited
+            if self.__version() >= self.SCHEMA_VERSION:
+                return
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS paths"
+                + " (key TEXT PRIMARY KEY, path TEXT NOT NULL) WITHOUT ROWID"
+            )
+            if legacy_file and os.path.exists(legacy_file):
+                legacy = make_and_check_go_data(legacy_file, GO_LINE)
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO paths VALUES (?, ?)",
+                    ((k.strip(), p.strip()) for k, p in legacy.items()),
+                )
+            self.db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @contextmanager
+    def transaction(self):
+        """Hold the write lock for a group of changes, which are kept only
+        if all of them succeed."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def __getitem__(self, key):
+        row = self.db.execute("SELECT path FROM paths WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __setitem__(self, key, path):
+        self.db.execute(
+            "INSERT INTO paths VALUES (?, ?)"
+            + " ON CONFLICT(key) DO UPDATE SET path = excluded.path",
+            (key, path),
+        )
+
+    def __delitem__(self, key):
+        if self.db.execute("DELETE FROM paths WHERE key = ?", (key,)).rowcount == 0:
+            raise KeyError(key)
+
+    def __iter__(self):
+        rows = self.db.execute("SELECT key FROM paths ORDER BY key").fetchall()
+        return (row[0] for row in rows)
+
+    def __len__(self):
+        return self.db.execute("SELECT count(*) FROM paths").fetchone()[0]
+
+    def items(self):
+        return self.db.execute("SELECT key, path FROM paths ORDER BY key").fetchall()
+
+    def clear(self):
+        self.db.execute("DELETE FROM paths")
+
+    def rename(self, old, new):
+        with self.transaction():
+            path = self[old]
+            del self[old]
+            self[new] = path
+
+    def with_prefix(self, prefix, limit=-1):
+        """Keys starting with prefix, in order, found by a range scan of the
+        key index."""
+        rows = self.db.execute(
+            "SELECT key FROM paths WHERE key >= ? AND key < ? ORDER BY key LIMIT ?",
+            (prefix, prefix + chr(0x10FFFF), limit),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def similar(self, key, n=3):
+        """Up to n keys that look like key, best first."""
+        import difflib
+
+        return difflib.get_close_matches(key, list(self), n)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def store_file(godata_file):
+    """The go store that replaces a go data file, next to it."""
+    return str(Path(godata_file).with_suffix(".db"))
+
+
+def save_go_paths(godata_file, go_paths):
+    """Keep changes to go_paths: a GoStore has already saved them, and a
+    dict is written to the go data file."""
+    if isinstance(go_paths, GoStore):
+        return True
+    return write_go_paths(godata_file, go_paths)
+
+
+def find_key(go_paths, key):
+    """key if it is a key of go_paths, else the only key starting with it,
+    else None."""
+    if key in go_paths:
+        return key
+    if isinstance(go_paths, GoStore):
+        matches = go_paths.with_prefix(key, limit=2)
+    else:
+        matches = [k for k in go_paths if k.startswith(key)][:2]
+    return matches[0] if len(matches) == 1 else None
+
+
+def similar_keys(go_paths, key, n=3):
+    if isinstance(go_paths, GoStore):
+        return go_paths.similar(key, n)
+    import difflib
+
+    return difflib.get_close_matches(key, list(go_paths), n)
 
 
 def make_and_check_go_data(godata_file, match_str):
@@ -27,9 +178,17 @@ def make_and_check_go_data(godata_file, match_str):
     return direc
 
 
-def show_go_paths(godata_file):
-    """Reads Go file for certain methods later"""
+def show_go_paths(godata_file, go_paths=None):
+    """Reads Go file for certain methods later, or the paths of a GoStore"""
     lines = []
+    if isinstance(go_paths, GoStore):
+        if len(go_paths) == 0:
+            print("\tNo GO paths currently exist. Try -add to add a new GO path.")
+        for key, path in go_paths.items():
+            line = "\t" + str(key) + "\t" + str(path) + " \n"
+            print(line)
+            lines.append(line)
+        return lines
     try:
         with open(godata_file, "r") as go:
             if os.stat(godata_file).st_size == 0:
@@ -40,7 +199,7 @@ def show_go_paths(godata_file):
                 print(line)
                 lines.append(line)
     except:
-        print("Failed to open file for reading: " + str(godata))
+        print("Failed to open file for reading: " + str(godata_file))
     return lines
 
 
@@ -60,10 +219,10 @@ def write_go_paths(godata_file, go_paths):
 def clear_go(godata_file, go_paths, parser, args):
     """Method re-writes Go file, all arguments exists in this in order to not cause errors later."""
     decision = input("Enter 'yes' to clear all paths: ")
-    run_clear_go(godata_file, decision)
+    run_clear_go(godata_file, decision, go_paths)
 
 
-def run_clear_go(godata_file, decision):
+def run_clear_go(godata_file, decision, go_paths=None):
     """Clears Go file based on decision input"""
     acceptable = [
         "yes",
@@ -73,7 +232,10 @@ def run_clear_go(godata_file, decision):
         "clear",
     ]
     if decision in acceptable:
-        write_go_paths(godata_file, {})
+        if go_paths is None:
+            go_paths = {}
+        go_paths.clear()
+        save_go_paths(godata_file, go_paths)
         print("Go File Cleared")
         return True
     else:
@@ -85,7 +247,7 @@ def add_go(godata_file, go_paths, parser, args):
     """Adds a key to Go file"""
     if os.path.exists(args.PATH):
         go_paths[args.KEY] = args.PATH
-        write_go_paths(godata_file, go_paths)
+        save_go_paths(godata_file, go_paths)
         print("Go Key-Path Added")
         return go_paths
     else:
@@ -97,9 +259,12 @@ def add_go(godata_file, go_paths, parser, args):
 def ren_go(godata_file, go_paths, parser, args):
     """Renames a Go path"""
     try:
-        go_paths[args.NEWKEY] = go_paths[args.OLDKEY]
-        del go_paths[args.OLDKEY]
-        write_go_paths(godata_file, go_paths)
+        if isinstance(go_paths, GoStore):
+            go_paths.rename(args.OLDKEY, args.NEWKEY)
+        else:
+            go_paths[args.NEWKEY] = go_paths[args.OLDKEY]
+            del go_paths[args.OLDKEY]
+        save_go_paths(godata_file, go_paths)
         print(
             "Go Key " + str(args.OLDKEY) + " Renamed. \nNew Name: " + str(args.NEWKEY)
         )
@@ -113,7 +278,7 @@ def del_go(godata_file, go_paths, parser, args):
     """Delete a path from Go file"""
     try:
         del go_paths[args.KEY]
-        write_go_paths(godata_file, go_paths)
+        save_go_paths(godata_file, go_paths)
         print("Go Path Deleted")
         return go_paths
     except:
@@ -121,18 +286,36 @@ def del_go(godata_file, go_paths, parser, args):
         return None
 
 
+def project_path(project, refresh=False):
+    """The path of an IPUMS project, cached on disk, since finding it means
+    importing ipums.metadata, which takes far longer than the rest of go."""
+    from ipums.tools.result_cache import ResultCache
+
+    cache = ResultCache("go")
+    key = cache.key(project=project)
+    path = None if refresh else cache.get(key)
+    if path is None:
+        from ipums.metadata import IPUMS
+
+        path = IPUMS(project).project.path
+        cache.put(key, path)
+    return path
+
+
 def ws_go(godata_file, go_paths, parser, args):
     """Add a workspace path to Go file"""
     try:
         projAndName = args.WORKSPACE.split("/")
         project = projAndName[0]
         name = projAndName[1]
-        proj = IPUMS(project)
-        proj_path = proj.project.path
-        full_path = os.path.join("~", proj_path, "workspaces", name)
+        full_path = os.path.join("~", project_path(project), "workspaces", name)
+        if not os.path.exists(full_path):
+            # The project may have moved since its path was cached
+            proj_path = project_path(project, refresh=True)
+            full_path = os.path.join("~", proj_path, "workspaces", name)
         if os.path.exists(full_path):
             go_paths[project + "/" + name] = full_path
-            write_go_paths(godata_file, go_paths)
+            save_go_paths(godata_file, go_paths)
             print("Successfully added " + project + "/" + name + " to Go File")
             return go_paths
         else:
@@ -152,18 +335,22 @@ def go_go(godata_file, go_paths, parser, args):
     if keys != []:
         badkeys = []
         for key in keys:
-            if key in go_paths.keys():
-                print(go_paths[key])
-                output.append(go_paths[key])
+            found = find_key(go_paths, key)
+            if found is not None:
+                print(go_paths[found])
+                output.append(go_paths[found])
             else:
                 print("Invalid Key: " + key)
+                similar = similar_keys(go_paths, key)
+                if similar:
+                    print("Did you mean: " + ", ".join(similar))
                 badkeys.append(key)
         if len(badkeys) > 0:
             print("\nInvalid Keys: " + str(badkeys))
             parser.print_help()
     else:
         print("Showing paths...")
-        output = show_go_paths(godata_file)
+        output = show_go_paths(godata_file, go_paths)
     return output
 
 
@@ -171,12 +358,13 @@ def run_parser(file_name):
     """Run argParse to allow for user input"""
     parser = argparse.ArgumentParser(
         description="""
-This script is an improved version of the Unix pushd(), popd(), and dirs() commands.  It creates a data file in the user's home directory to store paths as key-value pairs:\n
+This script is an improved version of the Unix pushd(), popd(), and dirs() commands.  It creates a small database in the user's home directory (go_USER.db) to store paths as key-value pairs:\n
                 KEY     /some/path
                 KEY     /some/other/path
                 etc.\n
-The user can then `cd` to those paths, using the assigned KEY.\n
+The user can then `cd` to those paths, using the assigned KEY, or any start of it that only one KEY begins with.\n
                 go KEY\n
+Paths from an existing go data file (go_USER.dat) are copied into the database the first time it is created.\n
 The script is designed to be run within the context of a Unix `cd` command.  In other words, whatever go.py prints to STDOUT becomes the argument supplied to `cd`.')""",
         epilog="""
 To get starting using this utility, you need to modify your shell configuration file:
@@ -240,11 +428,11 @@ def main():
     user = getpass.getuser()
     home = os.path.expanduser("~")
     godata = str(home) + "/go_" + str(user) + ".dat"
-    match_str = "^\s*(.+)\t(.+)\s+$"
     parser = run_parser(godata)
     args = parser.parse_args()
-    direc = make_and_check_go_data(godata, match_str)
-    args.func(godata_file=godata, go_paths=direc, parser=parser, args=args)
+    # The paths of the go data file are moved into the store on first use
+    with GoStore(store_file(godata), legacy_file=godata) as store:
+        args.func(godata_file=godata, go_paths=store, parser=parser, args=args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from ipums.tools.result_cache import CACHE_ROOT
+
+GZIP_MAGIC = b"\x1f\x8b\x08"
+READ_SIZE = 1 << 20
+INDEX_DIR = CACHE_ROOT / "gzip_index"
+
+
+def read_gzip(path, jobs=None):
+    """Decompress a gzip file, inflating its members in a process pool.
+
+    Large extracts are written as many concatenated gzip members, each of
+    which can be inflated independently. Member offsets come from the index
+    under INDEX_DIR, which is built on first read (see member_index).
+    Single-member files are inflated sequentially.
+    """
+    jobs = jobs or os.cpu_count()
+    members = [] if jobs == 1 else member_index(path, jobs)
+    if len(members) < 2:
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    with ProcessPoolExecutor(max_workers=min(jobs, len(members))) as pool:
+        inflated = list(pool.map(inflate_member, [path] * len(members), members))
+    chunks = [data for _, data in inflated]
+    end = members[-1] + inflated[-1][0]
+    with open(path, "rb") as f:
+        f.seek(end)
+        rest = f.read()
+    if rest.strip(b"\0"):
+        # Anything the chain of members could not account for
+        chunks.append(gzip.decompress(rest))
+    return b"".join(chunks)
+
+
+def member_index(path, jobs=None):
+    """Offsets of the gzip members of a file, from the saved index or found
+    and saved now.
+
+    Finding them inflates the file once, but only to measure each member:
+    the candidate offsets are checked in a process pool that throws the
+    inflated data away, so memory use does not grow with the file.
+    """
+    members = load_index(path)
+    if members is not None:
+        return members
+    jobs = jobs or os.cpu_count()
+    offsets = candidate_offsets(path)
+    if len(offsets) < 2:
+        # At most one member, and nothing to gain from measuring it
+        save_index(path, offsets)
+        return offsets
+    if jobs == 1:
+        lengths = {}
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(offsets))) as pool:
+            found = pool.map(member_length, [path] * len(offsets), offsets)
+            lengths = dict(zip(offsets, found))
+    members = chain_members(path, lengths)
+    save_index(path, members)
+    return members
+
+
+def candidate_offsets(path):
+    """Offsets of every gzip header signature in the file.
+
+    Compressed data can contain the signature by chance, so these are only
+    candidates until a member is inflated from them.
+    """
+    offsets = []
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return offsets
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(GZIP_MAGIC)
+            while pos != -1:
+                offsets.append(pos)
+                pos = mm.find(GZIP_MAGIC, pos + 1)
+    return offsets
+
+
+def inflate_member(path, offset):
+    """Inflate the single gzip member starting at offset.
+
+    Returns (compressed length, data), or (None, None) if no valid member
+    starts there.
+    """
+    chunks = []
+    length = walk_member(path, offset, chunks.append)
+    if length is None:
+        return None, None
+    return length, b"".join(chunks)
+
+
+def member_length(path, offset):
+    """The compressed length of the gzip member starting at offset, or None
+    if no valid member starts there. The inflated data is discarded."""
+    return walk_member(path, offset, lambda data: None)
+
+
+def walk_member(path, offset, output):
+    """Inflate the member starting at offset a block at a time, passing each
+    block's output to output. Returns the member's compressed length."""
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    consumed = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        try:
+            while not inflater.eof:
+                block = f.read(READ_SIZE)
+                if not block:
+                    return None
+                output(inflater.decompress(block))
+                consumed += len(block)
+        except zlib.error:
+            return None
+    return consumed - len(inflater.unused_data)
+
+
+def chain_members(path, lengths):
+    """Follow the members from the start of the file, each beginning where
+    the last one ended, discarding false candidates.
+
+    lengths holds the compressed length of the members already measured;
+    any other member on the chain is measured here. The chain stops at the
+    end of the file or at trailing data that is not a member.
+    """
+    size = os.path.getsize(path)
+    members = []
+    offset = 0
+    while offset < size:
+        length = lengths.get(offset)
+        if length is None:
+            length = member_length(path, offset)
+        if not length:
+            break
+        members.append(offset)
+        offset += length
+    return members
+
+
+def index_path(path):
+    path = Path(path).resolve()
+    return INDEX_DIR / (hashlib.sha256(str(path).encode()).hexdigest() + ".json")
+
+
+def load_index(path):
+    """Member offsets recorded for path, if the file has not changed since."""
+    try:
+        with open(index_path(path)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(path)
+    if index.get("size") != stat.st_size or index.get("mtime") != stat.st_mtime_ns:
+        return None
+    return index["members"]
+
+
+def save_index(path, members):
+    stat = os.stat(path)
+    index = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "members": members}
+    try:
+        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        with open(index_path(path), "w") as f:
+            json.dump(index, f)
+    except OSError:
+        # The index only saves time; an unwritable cache is not an error
+        pass
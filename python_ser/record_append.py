@@ -0,0 +1,146 @@
+import argparse
+import gzip
+import mmap
+import os
+import sys
+from ipums.tools.fixed_width import record_blocks
+
+# Bytes read at a time when counting lines or appending
+BLOCK_SIZE = 1 << 24
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="record_append",
+        description="""Append data to each record in a file, inserting it at the given position of every
+non-blank line. Plain or gzipped (.gz) input can be written as plain or gzipped output.""",
+    )
+    parser.add_argument(
+        "--input_file",
+        required=True,
+        help="Path to the file on disk you want to append to",
+    )
+    parser.add_argument(
+        "--output_file",
+        default="/tmp/output",
+        help="Path where you want the results of the program to be written to (gzipped if it ends in .gz)",
+    )
+    parser.add_argument(
+        "--append",
+        nargs="+",
+        required=True,
+        help="A space-separated list of data to append to each line. The string LINENUM is special and will be replaced with the current line number, zero-padded so that each line number has the same width.",
+    )
+    parser.add_argument(
+        "--append_position",
+        type=int,
+        required=True,
+        help="The line position (1 indexed) at which to append the data",
+    )
+    parser.add_argument(
+        "--linenum-width",
+        dest="linenum_width",
+        type=int,
+        help="Width of LINENUM. By default the lines of the input file are counted first to find it.",
+    )
+    return parser
+
+
+def open_input(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def count_lines(path):
+    """Number of lines in a file, counting a final line without a newline.
+
+    Plain files are memory-mapped and counted a block at a time; gzipped
+    files are streamed through the decompressor.
+    """
+    count = 0
+    last = b"\n"
+    if str(path).endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                count += block.count(b"\n")
+                last = block[-1:]
+    else:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for i in range(0, size, BLOCK_SIZE):
+                    count += mm[i : i + BLOCK_SIZE].count(b"\n")
+                last = mm[size - 1 : size]
+    return count + (last != b"\n")
+
+
+def insertion_parts(append):
+    """The --append values as literal bytes, with None standing for LINENUM."""
+    return [None if value == "LINENUM" else value.encode() for value in append]
+
+
+def appended_blocks(f, parts, position, linenum_width):
+    """Insert parts into every non-blank line of a binary stream, yielding
+    each block read as the bytes to write."""
+    offset = position - 1
+    linenum = 0
+    # Without LINENUM the same bytes are inserted into every line
+    literal = None if None in parts else b"".join(parts)
+    for data in record_blocks(f, BLOCK_SIZE):
+        lines = []
+        # Split the raw block so that carriage returns are kept as they are
+        records = data.buf.tobytes().split(b"\n")
+        if records[-1] == b"":
+            records.pop()
+        for record in records:
+            linenum += 1
+            if not record:
+                lines.append(b"")
+                continue
+            if len(record) < offset:
+                raise ValueError(
+                    f"Line {linenum} is shorter than the append position {position}"
+                )
+            insertion = literal
+            if literal is None:
+                number = str(linenum).zfill(linenum_width).encode()
+                if len(number) > linenum_width:
+                    raise ValueError(
+                        f"Line number {linenum} is wider than the LINENUM width {linenum_width}"
+                    )
+                insertion = b"".join(number if p is None else p for p in parts)
+            lines.append(record[:offset] + insertion + record[offset:])
+        lines.append(b"")
+        yield b"\n".join(lines)
+
+
+def record_append(args):
+    """Write the input file with the --append data inserted to the output
+    file. Returns the LINENUM width used, or None if LINENUM was not
+    appended."""
+    parts = insertion_parts(args.append)
+    width = None
+    if None in parts:
+        width = args.linenum_width or len(str(count_lines(args.input_file)))
+    opener = gzip.open if str(args.output_file).endswith(".gz") else open
+    with open_input(args.input_file) as f, opener(args.output_file, "wb") as out:
+        for block in appended_blocks(f, parts, args.append_position, width or 0):
+            out.write(block)
+    return width
+
+
+def main():
+    args = build_parser().parse_args()
+    if not os.path.exists(args.input_file):
+        print("The input file does not exist. Please check the file path.")
+        sys.exit(1)
+    width = record_append(args)
+    if width is not None:
+        print(f"LINENUM width is set to {width}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+CACHE_ROOT = (
+    Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "ipums_cli_tools"
+)
+# Budget per cache namespace, overridable with IPUMS_CLI_CACHE_MB
+DEFAULT_MAX_MB = 512
+
+
+class ResultCache:
+    """A directory of pickled results, evicted least recently used first
+    once it grows past max_mb.
+
+    Entries are keyed by a hash of whatever describes how the result was
+    made (see key()); reading an entry marks it as recently used.
+    """
+
+    def __init__(self, namespace, max_mb=None, root=None):
+        if max_mb is None:
+            max_mb = float(os.environ.get("IPUMS_CLI_CACHE_MB", DEFAULT_MAX_MB))
+        self.max_bytes = int(max_mb * 2**20)
+        self.directory = Path(root or CACHE_ROOT) / namespace
+
+    @staticmethod
+    def key(**parts):
+        blob = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def path(self, key):
+        return self.directory / f"{key}.pkl"
+
+    def get(self, key):
+        """The cached value for key, or None."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A damaged entry, or one pickled from classes that have since
+            # been renamed or moved, is a miss; drop it so it is rebuilt
+            path.unlink(missing_ok=True)
+            return None
+        return value
+
+    def put(self, key, value):
+        """Store value under key, then evict down to the size budget.
+
+        Failures to write are ignored, since the cache only saves time.
+        """
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for path in self.directory.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for path in self.directory.glob("*.pkl"):
+            path.unlink(missing_ok=True)
+
+
+def file_fingerprint(path):
+    """What identifies a data file's contents for caching: its resolved
+    path, size and modification time."""
+    stat = os.stat(path)
+    return [str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns]
+
+
+def content_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's contents, for results that depend only on what
+    the file holds, wherever it is."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
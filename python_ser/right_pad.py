@@ -1,12 +1,30 @@
 import argparse
+import glob
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from ipums.tools.fixed_width import record_blocks
+
+# Bytes read at a time; the file is padded one block of whole records at a
+# time, and the index arrays used to pad a block are 8 bytes per data byte
+BLOCK_SIZE = 1 << 23
+NEWLINE = ord("\n")
 
 
 def build_parser():
     parser = argparse.ArgumentParser(
         prog="Right_pad.py",
-        description="""This program right-pads a data file so that all lines have a minimum length, ignoring newlines. In the process, newlines are converted to Unix newlines. Lines longer than the minimum are not truncated.""",
+        description="""This program right-pads a data file so that all lines have a minimum length, ignoring newlines. In the process, newlines are converted to Unix newlines. Lines longer than the minimum are not truncated. The file is rewritten in place (gzipped again if it ends in .gz) by streaming it through a temporary file, so memory use does not grow with file size.""",
+    )
+    parser.add_argument(
+        "data_file",
+        nargs="+",
+        help="One or more data files, glob patterns, or directories of .dat and .dat.gz files (use '-' if supplied via a pipe; the padded data is then written to standard output)",
     )
-    parser.add_argument("data_file", help="(use '-' if supplied via a pipe)")
 
     gen = parser.add_argument_group("Options (general)")
     gen.add_argument("--len", metavar="N", type=int, help="Specify the desired length.")
@@ -36,6 +54,18 @@ def build_parser():
         action="store_true",
         help="Debug. Print output to screen rather than to original file.",
     )
+    gen.add_argument(
+        "--report",
+        action="store_true",
+        help="Print the number of records and the longest line (before padding) for each record type to standard error. Record types are counted when -s and -w are given.",
+    )
+    gen.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of files to pad at once (default = 1). Files already padded are left untouched, so a failed run can simply be repeated.",
+    )
 
     return parser.parse_args()
 
@@ -89,43 +119,307 @@ def asserter(args):
         )
 
 
-def read_data_file(args):
-    output_lines = []
+def rectype_lengths(args):
+    """Check the record type options once, returning a dict of rectype bytes
+    to target length, or None when padding everything to --len."""
+    if args.rt == None:
+        return None
     try:
-        with open(args.data_file, "r") as f:
-            while True:
-                line = f.readline()
-                if line:
-                    if args.rt == None:
-                        try:
-                            line = pad_line(line, args.p, args.len)
-                        except TypeError as e:
-                            raise e
-                        except ValueError as e:
-                            raise e
-                    else:
-                        line = rec_type_padder(line, args)
-                    output_lines.append(line)
-                else:
-                    break
-        return output_lines
+        asserter(args)
+    except AssertionError as e:
+        print("!!! ERROR FOUND PARSING COMMAND LINE ARGUMENTS !!!")
+        raise e
+    return {rt.encode("latin-1"): leng for rt, leng in zip(args.rt, args.rt_len)}
+
+
+def target_lengths(data, args, lookup=None):
+    """Length every record of data should be padded to.
+
+    lookup is the dict from rectype_lengths. Single-byte rectypes are mapped
+    through a 256-entry table; wider ones through the dict, once per
+    distinct rectype in the block.
+    """
+    if lookup is None:
+        lookup = rectype_lengths(args)
+    if lookup is None:
+        return np.full(len(data), args.len)
+    targets = np.full(len(data), -1)
+    fits = data.lengths >= args.s + args.w - 1
+    if fits.any():
+        if args.w == 1:
+            table = np.full(256, -1)
+            for rt, leng in lookup.items():
+                if len(rt) == 1:
+                    table[rt[0]] = leng
+            targets[fits] = table[data.buf[data.starts[fits] + args.s - 1]]
+        else:
+            rectypes, codes = np.unique(
+                data.subset(fits).column(args.s, args.w), return_inverse=True
+            )
+            table = np.array([lookup.get(rt, -1) for rt in rectypes.tolist()])
+            targets[fits] = table[codes.ravel()]
+    unmatched = np.flatnonzero(targets < 0)
+    if len(unmatched):
+        slic = args.s - 1
+        rt = data.record(unmatched[0])[slic : slic + args.w].decode("latin-1")
+        raise ValueError(
+            f"Could not find any matching rectype from given {args.rt} as {rt}"
+        )
+    return targets
+
+
+def pad_block(data, targets, padder):
+    """Pad every record of a block to its target length, returning the
+    padded block with Unix newlines.
+
+    Records are copied into a buffer prefilled with the padding character,
+    a group of records of the same length at a time.
+    """
+    out_starts = np.zeros(len(data), dtype=np.int64)
+    np.cumsum(targets[:-1] + 1, out=out_starts[1:])
+    out = np.full(int((targets + 1).sum()), padder, dtype=np.uint8)
+    out[out_starts + targets] = NEWLINE
+    order = np.argsort(data.lengths, kind="stable")
+    lengths, firsts = np.unique(data.lengths[order], return_index=True)
+    bounds = np.append(firsts, len(order))
+    for length, a, b in zip(lengths.tolist(), bounds[:-1], bounds[1:]):
+        if length == 0:
+            continue
+        rows = order[a:b, None]
+        cols = np.arange(length)
+        out[out_starts[rows] + cols] = data.buf[data.starts[rows] + cols]
+    return out.tobytes()
+
+
+def tally(data, args, report):
+    """Add a block's records to report, a dict of rectype to
+    [number of records, longest line]."""
+    if args.s is None or args.w is None:
+        groups = {"all": data.lengths}
+    else:
+        fits = data.lengths >= args.s + args.w - 1
+        groups = {"(short)": data.lengths[~fits]}
+        rectypes, codes = np.unique(
+            data.subset(fits).column(args.s, args.w), return_inverse=True
+        )
+        codes = codes.ravel()
+        for i, rt in enumerate(rectypes.tolist()):
+            groups[rt.decode("latin-1")] = data.lengths[fits][codes == i]
+    for rt, lengths in groups.items():
+        if len(lengths):
+            entry = report.setdefault(rt, [0, 0])
+            entry[0] += len(lengths)
+            entry[1] = max(entry[1], int(lengths.max()))
+
+
+def print_report(report, file=None):
+    file = file or sys.stderr
+    print("rectype\trecords\tlongest", file=file)
+    for rt, (count, longest) in sorted(report.items()):
+        print(f"{rt}\t{count}\t{longest}", file=file)
+    longest = max((entry[1] for entry in report.values()), default=0)
+    print(f"Longest line: {longest}", file=file)
+
+
+def open_data_file(data_file):
+    if str(data_file) == "-":
+        return sys.stdin.buffer
+    try:
+        if str(data_file).endswith(".gz"):
+            return gzip.open(data_file, "rb")
+        return open(data_file, "rb")
     except FileNotFoundError:
-        raise FileNotFoundError(f"Unable to find {args.data_file}")
+        raise FileNotFoundError(f"Unable to find {data_file}")
 
 
-def main():
-    args = build_parser()
+def padding_byte(args):
+    if len(args.p) != 1:
+        raise TypeError(f"Padding character {args.p} must be one character.")
+    return args.p.encode("latin-1")[0]
+
+
+def block_targets(data, args, lookup):
+    targets = target_lengths(data, args, lookup)
+    if (data.lengths > targets).any():
+        raise ValueError("Given line length is less than existing line lengths")
+    return targets
+
+
+def already_padded(f, args, report=None):
+    """Read a binary stream without writing anything, returning whether
+    every record already has its target length and a Unix newline.
+
+    Stops at the first record that needs changing. If the whole stream
+    passes and a report dict is given, its records are tallied into it.
+    """
+    padding_byte(args)
+    lookup = rectype_lengths(args)
+    seen = {}
+    for data in record_blocks(f, BLOCK_SIZE):
+        targets = block_targets(data, args, lookup)
+        # Records no longer than their targets fill exactly target + 1 bytes
+        # each only if none is short, none ends in CRLF and none lacks a
+        # newline
+        if (
+            (data.lengths < targets).any()
+            or len(data.buf) != int((targets + 1).sum())
+            or data.buf[-1] != NEWLINE
+        ):
+            return False
+        tally(data, args, seen)
+    if report is not None:
+        report.update(merge_reports([report, seen]))
+    return True
+
+
+def padded_blocks(f, args, report=None):
+    """Pad the records of a binary stream, yielding each block read along
+    with its padded bytes.
+
+    If a report dict is given, each block is tallied into it.
+    """
+    padder = padding_byte(args)
+    lookup = rectype_lengths(args)
+    for data in record_blocks(f, BLOCK_SIZE):
+        targets = block_targets(data, args, lookup)
+        if report is not None:
+            tally(data, args, report)
+        yield data, pad_block(data, targets, padder)
+
+
+def pad_data_file(args):
+    """Pad every record of the data file, returning the records as bytes."""
+    f = open_data_file(args.data_file)
+    with f:
+        padded = b"".join(block for _, block in padded_blocks(f, args))
+    return padded.split(b"\n")[:-1]
+
+
+def read_data_file(args):
+    return [line.decode("latin-1") for line in pad_data_file(args)]
+
+
+def write_blocks(blocks, out):
+    """Write padded blocks, returning whether any differed from the original
+    and the number of bytes written."""
+    changed = False
+    written = 0
+    for data, block in blocks:
+        changed = changed or len(block) != len(data.buf) or block != data.buf.tobytes()
+        out.write(block)
+        written += len(block)
+    return changed, written
+
+
+def rewrite_data_file(args, report=None):
+    """Pad the data file into a temporary file beside it, then rename that
+    over the original, so the original is untouched if padding fails.
+
+    The file is first read through without writing, so one that is already
+    padded is left as it is at the cost of a read. Returns whether the file
+    was changed and the number of bytes written.
+    """
+    data_file = str(args.data_file)
+    with open_data_file(data_file) as f:
+        if already_padded(f, args, report):
+            return False, 0
+    directory = os.path.dirname(os.path.abspath(data_file))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
     try:
-        output_lines = read_data_file(args)
-        if not args.d:
-            with open(args.data_file, "w") as f:
-                for line in output_lines:
-                    f.write(line + "\n")
+        with open_data_file(data_file) as f, os.fdopen(fd, "wb") as raw:
+            out = raw
+            if data_file.endswith(".gz"):
+                out = gzip.GzipFile(fileobj=raw, mode="wb")
+            changed, written = write_blocks(padded_blocks(f, args, report), out)
+            out.close()
+        if not changed:
+            os.unlink(tmp)
+            return False, 0
+        shutil.copymode(data_file, tmp)
+        os.replace(tmp, data_file)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return changed, written
+
+
+def expand_data_files(patterns):
+    """Data files named by paths, glob patterns or directories, in order and
+    without repeats."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(
+                glob.glob(os.path.join(pattern, "*.dat"))
+                + glob.glob(os.path.join(pattern, "*.dat.gz"))
+            )
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
         else:
-            for line in output_lines:
-                print(line.rstrip("\n"))
-    except FileNotFoundError as e:
-        raise e
+            matches = [pattern]
+        files.extend(f for f in matches if f not in files)
+    return files
+
+
+def pad_one(data_file, args):
+    """Pad one of several data files in place, returning whether it changed,
+    the bytes written and its rectype report."""
+    args = argparse.Namespace(**{**vars(args), "data_file": data_file})
+    report = {}
+    changed, written = rewrite_data_file(args, report)
+    return changed, written, report
+
+
+def merge_reports(reports):
+    merged = {}
+    for report in reports:
+        for rt, (count, longest) in report.items():
+            entry = merged.setdefault(rt, [0, 0])
+            entry[0] += count
+            entry[1] = max(entry[1], longest)
+    return merged
+
+
+def pad_files(files, args):
+    """Pad each file in place with up to args.jobs processes, printing a
+    summary of the run to standard error."""
+    if args.jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(files))) as pool:
+            results = list(pool.map(pad_one, files, [args] * len(files)))
+    else:
+        results = [pad_one(f, args) for f in files]
+    changed = sum(result[0] for result in results)
+    written = sum(result[1] for result in results)
+    print(
+        f"Files: {len(files)}, changed: {changed}, already padded: "
+        + f"{len(files) - changed}, bytes written: {written}",
+        file=sys.stderr,
+    )
+    print_report(merge_reports(result[2] for result in results))
+
+
+def main():
+    args = build_parser()
+    if args.data_file == ["-"]:
+        files = ["-"]
+    else:
+        files = expand_data_files(args.data_file)
+        if not files:
+            raise FileNotFoundError(f"Unable to find any of {args.data_file}")
+    report = {} if args.report else None
+    if args.d or files == ["-"]:
+        for data_file in files:
+            with open_data_file(data_file) as f:
+                write_blocks(padded_blocks(f, args, report), sys.stdout.buffer)
+    elif len(files) > 1:
+        pad_files(files, args)
+        return
+    else:
+        args.data_file = files[0]
+        rewrite_data_file(args, report)
+    if report is not None:
+        print_report(report)
 
 
 if __name__ == "__main__":
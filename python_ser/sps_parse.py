@@ -1,8 +1,7 @@
 import re
-import polars as pl
-from itertools import chain
+from ipums.tools.statfile_dd import build_dd, cached_parse, write_dd
+from ipums.tools.statfile_sections import SectionScanner, zipper
 import argparse
-import sys
 
 COMBOS = [
     ("VARIABLE LABELS\n", r"^record type \"(\w*)\""),
@@ -12,6 +11,8 @@ COMBOS = [
 
 
 class DataList:
+    REGEX = re.compile(r"\s+(\w+)\s+(\d+)-*(\d+)?\s(\(\w\))?")
+
     def __init__(self, rectype, name, start, end, fmt=None):
         self.rectype = rectype
         self.name = name
@@ -23,8 +24,7 @@ class DataList:
 
     @classmethod
     def parse(cls, line, rectype):
-        regex = r"\s+(\w+)\s+(\d+)-*(\d+)?\s(\(\w\))?"
-        res = re.finditer(regex, line)
+        res = cls.REGEX.finditer(line)
         new = []
         for m in res:
             new.append(
@@ -41,37 +41,17 @@ class DataList:
     def __repr__(self) -> str:
         return f"DataList(Rectype: {self.rectype}, Name: {self.name}, Start: {self.start}, End: {self.end}, Fmt: {self.fmt}, Label: {self.label}, ValueLabels: {self.valuelabels})"
 
-    def to_df(self):
-        head_line = [
-            (
-                self.rectype,
-                self.name.lower(),
-                str(self.start),
-                str(int(self.end) - int(self.start) + 1) if self.end else "1",
-                self.fmt if self.fmt else "",
-                "",
-                self.label,
-                "",
-                self.label,
-                "",
-            )
-        ]
-
-        return pl.DataFrame(
-            head_line + self.valuelabels if self.valuelabels else head_line,
-            orient="row",
-        )
-
 
 class VarLabel:
+    REGEX = re.compile(r"\s+(\w+)\s+(\'|\")(.+)(\'|\")\s")
+
     def __init__(self, name, label):
         self.name = name
         self.label = label
 
     @classmethod
     def parse(cls, line, leader):
-        regex = r"\s+(\w+)\s+(\'|\")(.+)(\'|\")\s"
-        m = re.match(regex, line)
+        m = cls.REGEX.match(line)
         if m:
             return cls(m.group(1), m.group(3))
 
@@ -80,6 +60,8 @@ class VarLabel:
 
 
 class ValueLabel:
+    REGEX = re.compile(r"\s+(\w+)\s+(\'|\")(.+)(\'|\")\s")
+
     def __init__(self, parent, value, label) -> None:
         self.parent = parent.rstrip("_f")
         self.value = value
@@ -87,8 +69,7 @@ class ValueLabel:
 
     @classmethod
     def parse(cls, line, leader):
-        regex = r"\s+(\w+)\s+(\'|\")(.+)(\'|\")\s"
-        m = re.match(regex, line)
+        m = cls.REGEX.match(line)
         if m and leader != ".":
             return cls(leader, m.group(1), m.group(3))
 
@@ -143,138 +124,51 @@ The parser ignores the following:
         action="store_true",
         help="Depricated. File does not deliniate between Stat Transfer files and non Stat Transfer files.",
     )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Write the data dictionary to this file instead of standard output: Excel if it ends in .xlsx, Parquet if it ends in .parquet, otherwise tab-delimited",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="Always parse the syntax file, ignoring and not saving cached results",
+    )
     return parser
 
 
+def parse(filename):
+    """The variables of a syntax file, with their labels attached."""
+    file_secs = build_file_sections(filename, COMBOS)
+    zipper(file_secs)
+    return file_secs["DataList"]
+
+
 def main():
     args = build_parser().parse_args()
-    file_secs = build_file_sections(args.filename, COMBOS)
-    zipper(file_secs)
-    df = build_df(file_secs["DataList"])
-    print(df.write_csv(file=None, separator="\t"), file=sys.stdout)
+    write_dd(cached_parse(parse, args.filename, args.no_cache), args.output)
 
 
 def build_file_sections(filename, combos):
+    scanner = SectionScanner(
+        [
+            ("DataList", DataList, combos[0]),
+            ("VarLabels", VarLabel, combos[1]),
+            ("ValueLabels", ValueLabel, combos[2]),
+        ]
+    )
     try:
         with open(filename, "r") as f:
-            file_secs = {
-                "DataList": parse_file_sections(f, DataList, combos[0]),
-                "VarLabels": parse_file_sections(f, VarLabel, combos[1]),
-                "ValueLabels": parse_file_sections(f, ValueLabel, combos[2]),
-            }
-        return file_secs
+            return scanner.scan(f)
     except FileNotFoundError:
         raise FileNotFoundError(
             f"Unable to process file. Are you sure this is the .sps file you're looking for?"
         )
 
 
-def parse_file_sections(file, cur, combo):
-    ender, sec_lead = combo
-    vals = []
-    leader = "."
-    for line in file:
-        if line.upper() == ender:
-            if cur == DataList:
-                return list(chain.from_iterable(vals))
-            else:
-                return vals
-        if sec_lead:
-            if m := re.search(sec_lead, line):
-                leader = m.group(1)
-        v = cur.parse(line, leader)
-        if v:
-            vals.append(v)
-    return vals
-
-
-def zipper(file_secs):
-    data_list, var_labels, value_labels = (
-        file_secs["DataList"],
-        file_secs["VarLabels"],
-        file_secs["ValueLabels"],
-    )
-    var_l = {v.name: v.label for v in var_labels}
-    value_l = {v.parent: [] for v in value_labels}
-    [(value_l[v.parent]).append(v.to_row()) for v in value_labels]
-    for d in data_list:
-        d.label = var_l[d.name] if d.name in var_l else ""
-        d.valuelabels = value_l[d.name] if d.name in value_l else None
-
-
 def build_df(dl):
-    df = pl.concat([d.to_df() for d in dl])
-    df.columns = [
-        "RecordType",
-        "Var",
-        "Col",
-        "Wid",
-        "Frm",
-        "Value",
-        "VarLabel",
-        "ValueLabel",
-        "VarLabelOrig",
-        "ValueLabelOrig",
-    ]
-    empty_cols_1 = pl.DataFrame(
-        {
-            "Freq": [],
-            "Sel": [],
-            "Notes": [],
-            "Svar": [],
-            "ValueSvar": [],
-        },
-        schema={
-            "Freq": pl.Utf8,
-            "Sel": pl.Utf8,
-            "Notes": pl.Utf8,
-            "Svar": pl.Utf8,
-            "ValueSvar": pl.Utf8,
-        },
-    )
-    df2 = df.select(
-        pl.col("VarLabelOrig").alias("VarLabelSvar"),
-        pl.col("ValueLabelOrig").alias("ValueLabelSvar"),
-    )
-    empty_cols_2 = pl.DataFrame(
-        {
-            "UnivSvar": [],
-            "NoRec": [],
-            "NonTab": [],
-            "Hide": [],
-            "Decim": [],
-            "String": [],
-            "CommP": [],
-            "CodeTy": [],
-            "DDoc1": [],
-            "Dtag1": [],
-            "JDoc1": [],
-            "JTag1": [],
-            "DDoc2": [],
-            "DTag2": [],
-            "JDoc2": [],
-            "JTag2": [],
-        },
-        schema={
-            "UnivSvar": pl.Utf8,
-            "NoRec": pl.Utf8,
-            "NonTab": pl.Utf8,
-            "Hide": pl.Utf8,
-            "Decim": pl.Utf8,
-            "String": pl.Utf8,
-            "CommP": pl.Utf8,
-            "CodeTy": pl.Utf8,
-            "DDoc1": pl.Utf8,
-            "Dtag1": pl.Utf8,
-            "JDoc1": pl.Utf8,
-            "JTag1": pl.Utf8,
-            "DDoc2": pl.Utf8,
-            "DTag2": pl.Utf8,
-            "JDoc2": pl.Utf8,
-            "JTag2": pl.Utf8,
-        },
-    )
-    return pl.concat([df, empty_cols_1, df2, empty_cols_2], how="horizontal")
+    return build_dd(dl)
 
 
 if __name__ == "__main__":
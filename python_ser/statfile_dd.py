@@ -0,0 +1,185 @@
+import os
+import sys
+from itertools import islice
+from pathlib import Path
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+from ipums.tools.result_cache import ResultCache, content_hash
+
+# Columns of the data dictionary written by the statfile parsers
+DD_COLUMNS = [
+    "RecordType",
+    "Var",
+    "Col",
+    "Wid",
+    "Frm",
+    "Value",
+    "VarLabel",
+    "ValueLabel",
+    "VarLabelOrig",
+    "ValueLabelOrig",
+    "Freq",
+    "Sel",
+    "Notes",
+    "Svar",
+    "ValueSvar",
+    "VarLabelSvar",
+    "ValueLabelSvar",
+    "UnivSvar",
+    "NoRec",
+    "NonTab",
+    "Hide",
+    "Decim",
+    "String",
+    "CommP",
+    "CodeTy",
+    "DDoc1",
+    "Dtag1",
+    "JDoc1",
+    "JTag1",
+    "DDoc2",
+    "DTag2",
+    "JDoc2",
+    "JTag2",
+]
+DD_SCHEMA = {column: pl.Utf8 for column in DD_COLUMNS}
+# The first ten columns come from the parsed syntax file
+PARSED_COLUMNS = DD_COLUMNS[:10]
+# Rows converted to Arrow at a time when writing Parquet
+BATCH_ROWS = 1 << 16
+
+
+def var_rows(dl):
+    """The data dictionary rows of one parsed variable: the variable itself,
+    then any value label rows (see ValueLabel.to_row), as tuples of the
+    PARSED_COLUMNS."""
+    head_line = (
+        dl.rectype,
+        dl.name.lower(),
+        str(dl.start),
+        str(int(dl.end) - int(dl.start) + 1) if dl.end else "1",
+        dl.fmt if dl.fmt else "",
+        "",
+        dl.label,
+        "",
+        dl.label,
+        "",
+    )
+    return [head_line] + (dl.valuelabels or [])
+
+
+def build_dd(data_list):
+    """Build the data dictionary frame of a parsed syntax file in one go.
+
+    Rows are accumulated as tuples and split into columns once, rather than
+    making a frame per variable. Columns the parsers do not fill are null,
+    except VarLabelSvar and ValueLabelSvar, which repeat the original labels.
+    """
+    rows = [row for dl in data_list for row in var_rows(dl)]
+    columns = dict(zip(PARSED_COLUMNS, map(list, zip(*rows))))
+    if not rows:
+        columns = {column: [] for column in PARSED_COLUMNS}
+    empty = [None] * len(rows)
+    data = {column: columns.get(column, empty) for column in DD_COLUMNS}
+    data["VarLabelSvar"] = columns["VarLabelOrig"]
+    data["ValueLabelSvar"] = columns["ValueLabelOrig"]
+    return pl.DataFrame(data, schema=DD_SCHEMA)
+
+
+def cached_parse(parse, filename, no_cache=False):
+    """parse(filename), reusing the result from a previous run on a file
+    with the same contents.
+
+    Results are kept in the "statfile_parse" ResultCache, keyed by the hash
+    of the syntax file and of every source file the parse depends on: the
+    parser's own module, this one and statfile_sections. Editing any of
+    them invalidates what was parsed before.
+    """
+    if no_cache or not os.path.isfile(filename):
+        # A missing file is left to the parser to report
+        return parse(filename)
+    cache = ResultCache("statfile_parse")
+    sources = [
+        sys.modules[parse.__module__].__file__,
+        __file__,
+        Path(__file__).with_name("statfile_sections.py"),
+    ]
+    key = cache.key(
+        syntax=content_hash(filename),
+        parser=parse.__module__,
+        sources=[content_hash(source) for source in sources],
+    )
+    data_list = cache.get(key)
+    if data_list is None:
+        data_list = parse(filename)
+        cache.put(key, data_list)
+    return data_list
+
+
+def dd_rows(data_list):
+    """Every row of the data dictionary as a tuple of DD_COLUMNS, one
+    variable at a time. Unfilled columns are None, as in build_dd."""
+    tail = (None,) * (len(DD_COLUMNS) - len(PARSED_COLUMNS) - 7)
+    for dl in data_list:
+        for row in var_rows(dl):
+            yield row + (None,) * 5 + (row[8], row[9]) + tail
+
+
+def tsv_field(value):
+    """A value formatted as polars writes it to a tab-delimited file: null
+    as nothing, and an empty string, or one with a tab, quote or line
+    break, quoted."""
+    if value is None:
+        return ""
+    if value == "" or any(c in value for c in '\t"\n\r'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def write_tsv(rows, f):
+    f.write("\t".join(DD_COLUMNS) + "\n")
+    for row in rows:
+        f.write("\t".join(map(tsv_field, row)) + "\n")
+
+
+def write_xlsx(rows, path):
+    # constant_memory flushes each row to disk once the next one is begun
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+    sheet = workbook.add_worksheet()
+    sheet.write_row(0, 0, DD_COLUMNS)
+    for i, row in enumerate(rows, 1):
+        for j, value in enumerate(row):
+            if value is not None:
+                sheet.write_string(i, j, value)
+    workbook.close()
+
+
+def write_parquet(rows, path):
+    schema = pa.schema([(column, pa.string()) for column in DD_COLUMNS])
+    with pq.ParquetWriter(str(path), schema) as writer:
+        while batch := list(islice(rows, BATCH_ROWS)):
+            columns = [pa.array(column, pa.string()) for column in zip(*batch)]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+
+
+def write_dd(data_list, output=None):
+    """Write the data dictionary of a parsed syntax file a row at a time.
+
+    The format follows the output path's suffix: .xlsx for a spreadsheet,
+    .parquet for Parquet, and tab-delimited otherwise. Without an output
+    path it is written tab-delimited to standard output.
+    """
+    rows = dd_rows(data_list)
+    if output is None or str(output) == "-":
+        write_tsv(rows, sys.stdout)
+        return
+    suffix = Path(output).suffix.lower()
+    if suffix == ".xlsx":
+        write_xlsx(rows, output)
+    elif suffix == ".parquet":
+        write_parquet(rows, output)
+    else:
+        with open(output, "w", newline="") as f:
+            write_tsv(rows, f)
@@ -1,8 +1,16 @@
 import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from .do_parse import main as do_parse
-from .sas_parse import main as sas_parse
-from .sps_parse import main as sps_parse
+from .do_parse import parse as do_parse
+from .sas_parse import parse as sas_parse
+from .sps_parse import parse as sps_parse
+from .statfile_dd import cached_parse, write_dd
+
+# The parser for each kind of syntax file, by suffix
+PARSERS = {".do": do_parse, ".sas": sas_parse, ".sps": sps_parse}
 
 
 def build_parser():
@@ -20,8 +28,14 @@ its content as a tab-delimited data dictionary.
 Command-line arguments:
     syntax file ( file needs file extension of .sas .sps or .do )
 
+Several syntax files, directories of them, or glob patterns can be given
+to parse a batch of files at once. Each is then written to its own data
+dictionary, <syntax file>.<format>, next to it or in --out_dir, and any
+files that could not be parsed are listed at the end.
+
 Output:
-    written to standard output (typically, the screen)
+    written to standard output (typically, the screen), or to the file
+    given with -o (.xlsx for Excel, .parquet for Parquet, else tab-delimited)
 
 Options:
     -help        Display this help message.
@@ -30,6 +44,11 @@ Options:
                  pre-processed, converting it into the format described below
                  so that it can then be parsed.
     -debug_ST    Just run the -stat_trans pre-processing step.
+    -o, --output Write the data dictionary to a file.
+    --out_dir    Directory for the data dictionaries of a batch.
+    -f, --format Format of the data dictionaries of a batch.
+    -j, --jobs   Number of files of a batch to parse at once.
+    --no-cache   Parse every file, even if it was parsed unchanged before.
 
 The parser expects a syntax file with three basic sections: DATA LIST,
 VARIABLE LABELS, and VALUE LABELS. Optionally, there can be multiple
@@ -60,7 +79,11 @@ The parser ignores the following:
     - leading and trailing white space on all lines
     - blank lines""",
     )
-    parser.add_argument("filename", help=".sps, .sas, or .do file")
+    parser.add_argument(
+        "filename",
+        nargs="+",
+        help=".sps, .sas, or .do file, or several of them, directories or glob patterns",
+    )
     parser.add_argument(
         "-stat_trans",
         action="store_true",
@@ -71,27 +94,133 @@ The parser ignores the following:
         action="store_true",
         help="Depricated. File does not deliniate between Stat Transfer files and non Stat Transfer files.",
     )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Write the data dictionary to this file instead of standard output: Excel if it ends in .xlsx, Parquet if it ends in .parquet, otherwise tab-delimited",
+    )
+    parser.add_argument(
+        "--out_dir",
+        help="Directory to write the data dictionary of each file of a batch to (default: next to the file)",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["tsv", "xlsx", "parquet"],
+        default="tsv",
+        help="Format of the data dictionary of each file of a batch (default: tsv)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of files of a batch to parse at once (default: 1)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="Always parse the syntax file, ignoring and not saving cached results",
+    )
     return parser
 
 
 def main():
-    args = build_parser().parse_args()
-    decide_which(args)
+    parser = build_parser()
+    args = parser.parse_args()
+    if len(args.filename) == 1 and not is_batch(args.filename[0], args.out_dir):
+        args.filename = args.filename[0]
+        decide_which(args)
+        return
+    if args.output:
+        parser.error("-o names a single output; use --out_dir with several files")
+    files = expand_syntax_files(args.filename)
+    if not files:
+        raise FileNotFoundError(f"Unable to find any syntax files in {args.filename}")
+    if parse_files(files, args):
+        sys.exit(1)
+
+
+def is_batch(filename, out_dir):
+    return bool(out_dir) or os.path.isdir(filename) or glob.has_magic(filename)
 
 
 def decide_which(args):
     suffix = Path(args.filename).suffix
-    if suffix == ".do":
-        do_parse()
-    elif suffix == ".sas":
-        sas_parse()
-    elif suffix == ".sps":
-        sps_parse()
+    if suffix in PARSERS:
+        write_dd(
+            cached_parse(PARSERS[suffix], args.filename, args.no_cache), args.output
+        )
     else:
         print(
             f"ERROR: File did not end in one of .do, .sas, or .sps. File supplied is of type {suffix}."
         )
 
 
+def expand_syntax_files(patterns):
+    """Syntax files named by paths, glob patterns or directories, in order
+    and without repeats. Directories contribute their .do, .sas and .sps
+    files."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(
+                f
+                for suffix in PARSERS
+                for f in glob.glob(os.path.join(pattern, "*" + suffix))
+            )
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+        else:
+            matches = [pattern]
+        files.extend(f for f in matches if f not in files)
+    return files
+
+
+def output_path(filename, out_dir, fmt):
+    directory = Path(out_dir) if out_dir else Path(filename).parent
+    return directory / f"{Path(filename).name}.{fmt}"
+
+
+def parse_one(filename, output, no_cache=False):
+    """Parse a syntax file to the data dictionary at output, returning the
+    error that stopped it, if any, as text."""
+    suffix = Path(filename).suffix
+    try:
+        if suffix not in PARSERS:
+            raise ValueError("File did not end in one of .do, .sas, or .sps")
+        write_dd(cached_parse(PARSERS[suffix], filename, no_cache), output)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def parse_files(files, args):
+    """Parse each file to its own data dictionary with up to args.jobs
+    processes, printing a summary of the run to standard error. Returns
+    the files that failed with their errors."""
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    outputs = [output_path(f, args.out_dir, args.format) for f in files]
+    if args.jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(files))) as pool:
+            errors = list(
+                pool.map(parse_one, files, outputs, [args.no_cache] * len(files))
+            )
+    else:
+        errors = [
+            parse_one(f, output, args.no_cache) for f, output in zip(files, outputs)
+        ]
+    failed = [(f, error) for f, error in zip(files, errors) if error is not None]
+    print(
+        f"Files: {len(files)}, parsed: {len(files) - len(failed)}, failed: {len(failed)}",
+        file=sys.stderr,
+    )
+    for f, error in failed:
+        print(f"  {f}: {error}", file=sys.stderr)
+    return failed
+
+
 if __name__ == "__main__":
     main()
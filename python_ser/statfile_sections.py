@@ -0,0 +1,55 @@
+import re
+
+
+class SectionScanner:
+    """Reads the sections of an SPSS or SAS syntax file in one pass.
+
+    sections lists, in the order they appear in the file, each section's
+    name, the class that parses its lines and its (ender, leader) combo: the
+    line that ends the section and an optional pattern whose first group,
+    wherever it matches, becomes the leader passed to the parser for the
+    lines that follow (the rectype of a data list, the variable of value
+    labels). Each line is only tried against the active section.
+    """
+
+    def __init__(self, sections):
+        self.sections = [
+            (name, cls, ender, re.compile(leader) if leader else None)
+            for name, cls, (ender, leader) in sections
+        ]
+
+    def scan(self, lines):
+        """Parse lines until the last section ends, returning a dict of the
+        values parsed for each section. Data lists, whose lines can hold
+        several variables, are flattened into one list."""
+        lines = iter(lines)
+        found = {name: [] for name, _, _, _ in self.sections}
+        for name, cls, ender, leader_re in self.sections:
+            vals = found[name]
+            parse = cls.parse
+            leader = "."
+            for line in lines:
+                # Only a line as long as the ender can end the section
+                if len(line) == len(ender) and line.upper() == ender:
+                    break
+                if leader_re is not None:
+                    if m := leader_re.search(line):
+                        leader = m.group(1)
+                v = parse(line, leader)
+                if isinstance(v, list):
+                    vals.extend(v)
+                elif v:
+                    vals.append(v)
+        return found
+
+
+def zipper(file_secs):
+    """Attach the variable labels and value labels of a syntax file to its
+    variables, joining each through a dict keyed by variable name."""
+    var_l = {v.name: v.label for v in file_secs["VarLabels"]}
+    value_l = {}
+    for v in file_secs["ValueLabels"]:
+        value_l.setdefault(v.parent, []).append(v.to_row())
+    for d in file_secs["DataList"]:
+        d.label = var_l.get(d.name, "")
+        d.valuelabels = value_l.get(d.name)
@@ -1,6 +1,7 @@
 import sys
 from pathlib import Path
 import pytest
+from ipums.tools import gzip_index, result_cache
 
 
 @pytest.fixture
@@ -49,6 +50,15 @@ def out_data_dir():
     return Path(__file__).parent / "out_data"
 
 
+@pytest.fixture(autouse=True)
+def cache_root(tmp_path, monkeypatch):
+    """Keep cached results and gzip indexes out of the real ~/.cache."""
+    root = tmp_path / "cache"
+    monkeypatch.setattr(result_cache, "CACHE_ROOT", root)
+    monkeypatch.setattr(gzip_index, "INDEX_DIR", root / "gzip_index")
+    return root
+
+
 @pytest.fixture
 def audit_datalist():
     def audit(dl, rectype, zipped=False):
@@ -0,0 +1,65 @@
+import gzip
+import sys
+from argparse import Namespace
+import pytest
+import ipums.tools.char_find as cf
+from ipums.tools import fixed_width
+from ipums.tools.fixed_width import FixedWidthFile
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    data_file = tmp_path / "find.dat"
+    data_file.write_bytes(b"P1?2?\nH??9\nP.a.\n")
+    return data_file
+
+
+def test_help_smoke(check_help_msg):
+    check_help_msg("char_find", cf.main, ["--help", "Find characters"])
+
+
+@pytest.mark.parametrize("block_lines", [1, 2, 100])
+def test_find_matches(data_file, block_lines):
+    data = FixedWidthFile(data_file)
+    pattern = cf.compile_pattern("?", noregex=True)
+    lines, columns, texts = cf.find_matches(data, pattern, block_lines)
+    assert lines.tolist() == [0, 0, 1, 1]
+    assert columns.tolist() == [3, 5, 2, 3]
+    assert texts == [b"?"] * 4
+
+    # Matches are confined to a line, and ^ and $ anchor at line boundaries
+    pattern = cf.compile_pattern(r"\?\s*[HP]|^P.|.$")
+    lines, columns, texts = cf.find_matches(data, pattern, block_lines)
+    assert lines.tolist() == [0, 0, 1, 2, 2]
+    assert columns.tolist() == [2, 5, 4, 2, 4]
+    assert texts == [b"P1", b"?", b"9", b"P.", b"."]
+
+
+def test_main(data_file, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["char_find", r"\?", str(data_file), "-d"])
+    cf.main()
+    summary, detail = capsys.readouterr().out.split("\n\n")
+    assert summary.splitlines() == [
+        "File\tText\tRecType\tColumn\tN",
+        f"{data_file}\t'?'\t'H'\t2\t1",
+        f"{data_file}\t'?'\t'H'\t3\t1",
+        f"{data_file}\t'?'\t'P'\t3\t1",
+        f"{data_file}\t'?'\t'P'\t5\t1",
+    ]
+    assert detail.splitlines()[0] == f"{data_file}\tP\t1\t3\t?"
+    assert len(detail.splitlines()) == 4
+
+
+def test_find_in_gzip_blocks(data_file, tmp_path, monkeypatch):
+    gz_file = tmp_path / "find.dat.gz"
+    gz_file.write_bytes(gzip.compress(data_file.read_bytes()))
+    monkeypatch.setattr(
+        cf, "data_blocks", lambda source: fixed_width.data_blocks(source, 6)
+    )
+    args = Namespace(
+        pattern="?", noregex=True, ignorert=False, rtstart=1, rtwidth=1, findvars=False
+    )
+    df = cf.find_in_source(gz_file, args)
+    assert df["LineNum"].to_list() == [1, 1, 2, 2]
+    assert df["RecType"].to_list() == ["P", "P", "H", "H"]
+    assert df["Column"].to_list() == [3, 5, 2, 3]
@@ -0,0 +1,125 @@
+import pickle
+import pytest
+import ipums.tools.result_cache as result_cache
+from ipums.tools.column_index import *
+
+
+class FakeDD:
+    """The parts of DataDictionary that ColumnIndex uses."""
+
+    project = "usa"
+    sample = "us1900a"
+    layout = {
+        "RECTYPE": ("P", 1, 1),
+        "AGE": ("P", 2, 2),
+        "SEX": ("P", 4, 1),
+        "AGESEX": ("P", 2, 3),
+        "SIZE": ("H", 2, 3),
+    }
+    all_svars = list(layout)
+
+    def __init__(self, xlpath=None):
+        self.xlpath = xlpath
+
+    def svar_to_rectype(self, svar):
+        return self.layout[svar][0]
+
+    def svar_to_start_and_wid(self, svar):
+        return {"start": self.layout[svar][1], "wid": self.layout[svar][2]}
+
+
+@pytest.fixture
+def index():
+    return ColumnIndex.from_data_dictionary(FakeDD())
+
+
+def test_find(index):
+    assert index.find("P", 1) == "RECTYPE"
+    assert index.find("P", 3) == "AGE"
+    assert index.find("P", 4) == "SEX"
+    assert index.find("P", 5) is None
+    assert index.find("H", 4) == "SIZE"
+    assert index.find("X", 1) is None
+
+
+def test_overlapping(index):
+    assert index.overlapping("P", 3, 2) == ["AGE", "AGESEX", "SEX"]
+    assert index.overlapping("P", 1) == ["RECTYPE"]
+    assert index.overlapping("H", 5, 10) == []
+
+
+def test_find_many(index):
+    rectypes = ["P", "P", "P", "H", "H", "X"]
+    columns = [1, 3, 4, 4, 5, 1]
+    assert index.find_many(rectypes, columns).tolist() == [
+        "RECTYPE",
+        "AGE",
+        "SEX",
+        "SIZE",
+        "",
+        "",
+    ]
+    index = ColumnIndex.from_data_dictionary(FakeDD(), ignorert=True)
+    assert index.find_many(rectypes, columns).tolist() == [
+        "RECTYPE",
+        "AGE",
+        "SEX",
+        "SEX",
+        "",
+        "RECTYPE",
+    ]
+
+
+def test_from_variables():
+    class FakeVariables:
+        all_variables = ["AGE", "SEX"]
+
+        def variable_to_rectype(self, var):
+            return "P"
+
+        def variable_to_start_and_wid(self, var):
+            return {"AGE": (2, 3), "SEX": (5, 1)}[var]
+
+    index = ColumnIndex.from_variables(FakeVariables())
+    assert index.find("P", 4) == "AGE"
+    assert index.find("P", 5) == "SEX"
+
+
+def test_sample_index_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_ROOT", tmp_path / "cache")
+    xlpath = tmp_path / "us1900a.xlsx"
+    xlpath.write_bytes(b"dd")
+    index = sample_index(FakeDD(xlpath))
+    assert pickle.loads(pickle.dumps(index)).find("P", 4) == "SEX"
+    monkeypatch.setattr(ColumnIndex, "from_data_dictionary", None)
+    assert sample_index(FakeDD(xlpath)).find("P", 3) == "AGE"
+
+
+def test_wide_variable():
+    # A recode spanning the whole record overlaps every other variable
+    entries = [("P", "WIDE", 1, 1000)] + [
+        ("P", f"V{i}", i * 2 + 1, 2) for i in range(500)
+    ]
+    index = ColumnIndex(entries)
+    assert len(index.rectypes["P"]) == 2
+    assert index.find("P", 1) == "V0"
+    assert index.find("P", 900) == "V449"
+    assert index.find("P", 1000) == "V499"
+    assert index.find("P", 1001) is None
+    assert index.overlapping("P", 899, 3) == ["WIDE", "V449", "V450"]
+    assert index.find_many(["P"] * 3, [2, 999, 1001]).tolist() == [
+        "V0",
+        "V499",
+        "",
+    ]
+    index = ColumnIndex(entries + [("P", "GAP", 1001, 10)])
+    assert index.find("P", 1005) == "GAP"
+    assert ColumnIndex([("P", "WIDE", 1, 1000)]).find("P", 1000) == "WIDE"
+
+
+def test_empty_index():
+    for ignorert in (False, True):
+        index = ColumnIndex([], ignorert=ignorert)
+        assert index.find("P", 1) is None
+        assert index.overlapping("P", 1) == []
+        assert index.find_many(["P", "H"], [1, 2]).tolist() == ["", ""]
@@ -1,4 +1,6 @@
+import io
 import pytest
+import time
 from argparse import ArgumentError
 from ipums.tools.command_maker import *
 
@@ -14,6 +16,9 @@ class ExampleArgs:
         n=False,
         sp=False,
         a=False,
+        j=1,
+        k=False,
+        vf=None,
     ) -> None:
         self.command = command
         self.values = values
@@ -23,6 +28,9 @@ class ExampleArgs:
         self.n = n
         self.sp = sp
         self.aro = a
+        self.jobs = j
+        self.keep_going = k
+        self.values_file = vf
 
 
 def test_ppf(test_data_dir):
@@ -188,3 +196,70 @@ def test_det_fin(capfd):
     )
     determine_final(ta, ["date", "date"])
     assert capfd.readouterr().out == "date date \n"
+
+
+def test_command_argv():
+    assert command_argv("basename '/pkg/a b'") == ["basename", "/pkg/a b"]
+    assert command_argv("gzip -dc a.gz | cut -c1-3") is None
+    assert command_argv("cp data*.dat test/") is None
+    assert command_argv("LC_ALL=C sort a") is None
+    assert command_argv("echo 'unclosed") is None
+
+
+def test_run_commands(capfd):
+    commands = ["true", "sh -c 'echo one >&2; echo two >&2; exit 3'", "echo last"]
+    failed = run_commands(commands)
+    assert [(r.returncode, r.stderr_tail) for r in failed] == [(3, ["one", "two"])]
+    out, err = capfd.readouterr()
+    assert out == ""
+    assert "one\ntwo\n" in err
+    assert "[exit 3, " in err
+    assert "Commands run: 2, succeeded: 1, failed: 1" in err
+    assert "Failed with exit 3: sh -c" in err
+    assert "later commands were not run" in err
+
+    failed = run_commands(iter(commands), jobs=2, keep_going=True)
+    assert [r.returncode for r in failed] == [3]
+    out, err = capfd.readouterr()
+    assert out == "last\n"
+    assert "Commands run: 3, succeeded: 2, failed: 1" in err
+    assert "not run" not in err
+
+
+def test_run_commands_at_once():
+    start = time.perf_counter()
+    assert run_commands(["sleep 0.5"] * 4, jobs=4) == []
+    assert time.perf_counter() - start < 1.5
+
+
+def test_iter_sprintf_streams():
+    def values():
+        yield from ["a", "1"]
+        raise AssertionError("read past the first command")
+
+    commands = iter_sprintf(["mv %s.txt %05d.dat"], values())
+    assert next(commands) == "mv a.txt 00001.dat"
+
+
+def test_iter_aro():
+    values = ["a", "b", "c", 1, 2, 3]
+    assert list(iter_aro("mv %s.txt %05d.dat", 2, values)) == [
+        "mv a.txt 00001.dat",
+        "mv b.txt 00002.dat",
+        "mv c.txt 00003.dat",
+    ]
+
+
+def test_cmd_builder_values_file(tmp_path, monkeypatch):
+    values = tmp_path / "values.txt"
+    values.write_text("3\n\n4\n")
+    ta = ExampleArgs(
+        command="gzip data**.dat", values=["1", "2"], wc="**", vf=str(values)
+    )
+    commands = cmd_builder(ta)
+    assert not isinstance(commands, list)
+    assert list(commands) == [f"gzip data{i}.dat" for i in range(1, 5)]
+
+    monkeypatch.setattr("sys.stdin", io.StringIO("a\nb\n"))
+    ta = ExampleArgs(command="cp %s.txt %s.dat", values=[], sp=True, vf="-")
+    assert list(cmd_builder(ta)) == ["cp a.txt b.dat"]
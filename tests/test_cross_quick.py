@@ -0,0 +1,124 @@
+import gzip
+import sys
+import numpy as np
+import pytest
+import ipums.tools.cross_quick as cq
+from ipums.tools.fixed_width import FixedWidthFile
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    data_file = tmp_path / "cross.dat"
+    data_file.write_bytes(b"P12 3\nP11 1\nH12 9\nP22 2\nP12 4\n")
+    return data_file
+
+
+def test_help_smoke(check_help_msg):
+    check_help_msg("cross_quick", cq.main, ["--help", "crosstabulation"])
+
+
+def test_crosstab(data_file):
+    data = FixedWidthFile(data_file)
+    data = data.subset(data.rectype_mask("P"))
+    values, cells, counts = cq.crosstab(data, [(2, 1), (3, 1)])
+    assert [list(v) for v in values] == [[b"1", b"2"], [b"1", b"2"]]
+    assert cells.tolist() == [[0, 0], [0, 1], [1, 1]]
+    assert counts.tolist() == [1, 2, 1]
+    assert cq.table(values, cells, counts).tolist() == [
+        [1, 2, 3],
+        [0, 1, 1],
+        [1, 3, 4],
+    ]
+
+    weights = data.column(5, 1).astype(np.float64)
+    values, cells, counts = cq.crosstab(data, [(2, 1), (3, 1)], weights)
+    assert cq.table(values, cells, counts).tolist() == [
+        [1, 7, 8],
+        [0, 2, 2],
+        [1, 9, 10],
+    ]
+
+
+def test_crosstab_nway(data_file):
+    data = FixedWidthFile(data_file)
+    values, cells, counts = cq.crosstab(data, [(1, 1), (2, 1), (3, 1)])
+    assert [list(v) for v in values] == [[b"H", b"P"], [b"1", b"2"], [b"1", b"2"]]
+    assert cells.tolist() == [[0, 0, 1], [1, 0, 0], [1, 0, 1], [1, 1, 1]]
+    assert counts.tolist() == [1, 1, 2, 1]
+
+    sliced = cq.slices([values[1], values[2], values[0]], cells[:, [1, 2, 0]], counts)
+    assert [(key, t.tolist()) for key, t in sliced] == [
+        ([b"H"], [[0, 1, 1], [0, 0, 0], [0, 1, 1]]),
+        ([b"P"], [[1, 2, 3], [0, 1, 1], [1, 3, 4]]),
+    ]
+
+    frame = cq.long_frame(values, cells, counts, quote=True)
+    assert frame["column_0"].tolist() == ["'H'", "'P'", "'P'", "'P'"]
+    assert frame["Frequency"].tolist() == [1, 1, 2, 1]
+
+
+def test_merge_crosstabs(data_file):
+    data = FixedWidthFile(data_file)
+    locs = [(1, 1), (2, 1), (3, 1)]
+    weights = data.column(5, 1).astype(np.float64)
+    whole = cq.crosstab(data, locs, weights)
+    parts = [np.arange(5) < 2, np.arange(5) >= 2]
+    merged = cq.merge_crosstabs(
+        [cq.crosstab(data.subset(p), locs, weights[p]) for p in parts]
+    )
+    assert [list(v) for v in merged[0]] == [list(v) for v in whole[0]]
+    assert merged[1].tolist() == whole[1].tolist()
+    assert merged[2].tolist() == whole[2].tolist()
+    assert merged[2].dtype == whole[2].dtype
+
+
+def test_main_gzip(data_file, tmp_path, monkeypatch, capsys):
+    gz_file = tmp_path / "cross.dat.gz"
+    gz_file.write_bytes(gzip.compress(data_file.read_bytes()))
+    monkeypatch.setattr(
+        sys, "argv", ["cross_quick", str(gz_file), "2", "1", "3", "1", "-r", "P"]
+    )
+    cq.main()
+    out = capsys.readouterr().out.splitlines()
+    assert out[-1].split() == ["*TOT*", "1", "3", "4"]
+
+
+def test_main(data_file, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(
+        sys, "argv", ["cross_quick", str(data_file), "2", "1", "3", "1", "-r", "P"]
+    )
+    monkeypatch.setattr(cq.ResultCache, "__init__", lambda self, ns: None)
+    monkeypatch.setattr(cq.ResultCache, "get", lambda self, key: None)
+    monkeypatch.setattr(cq.ResultCache, "put", lambda self, key, value: None)
+    cq.main()
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].split() == ["column_1", "1", "2", "*TOT*"]
+    assert out[-1].split() == ["*TOT*", "1", "3", "4"]
+
+
+def test_main_long(data_file, monkeypatch, capsys):
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["cross_quick", str(data_file), "1", "1", "2", "1", "3", "1", "--long"],
+    )
+    monkeypatch.setattr(cq.ResultCache, "__init__", lambda self, ns: None)
+    monkeypatch.setattr(cq.ResultCache, "get", lambda self, key: None)
+    monkeypatch.setattr(cq.ResultCache, "put", lambda self, key, value: None)
+    cq.main()
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].split() == ["column_0", "column_1", "column_2", "Frequency"]
+    assert [line.split() for line in out[1:]] == [
+        ["H", "1", "2", "1"],
+        ["P", "1", "1", "1"],
+        ["P", "1", "2", "2"],
+        ["P", "2", "2", "1"],
+    ]
+
+
+def test_bytes_undefined_in_cp1252(tmp_path):
+    data_file = tmp_path / "cross.dat"
+    data_file.write_bytes(b"P\x811\nP\x902\n")
+    values, cells, counts = cq.crosstab(FixedWidthFile(data_file), [(2, 1), (3, 1)])
+    frame = cq.long_frame(values, cells, counts, quote=False)
+    assert frame["column_0"].tolist() == ["\x81", "\x90"]
@@ -0,0 +1,118 @@
+import gzip
+import io
+import numpy as np
+import pytest
+from ipums.tools.fixed_width import (
+    FixedWidthFile,
+    data_blocks,
+    find_records,
+    record_blocks,
+)
+
+
+@pytest.fixture
+def ragged_file(tmp_path):
+    data_file = tmp_path / "ragged.dat"
+    data_file.write_bytes(b"Pab1 0012\nPcd2 0030\r\nHxxxxx\nPab1 0001")
+    return data_file
+
+
+@pytest.fixture
+def uniform_file(tmp_path):
+    data_file = tmp_path / "uniform.dat"
+    data_file.write_bytes(b"P01A\nH02B\nP03C\n")
+    return data_file
+
+
+def test_find_records():
+    starts, lengths = find_records(np.frombuffer(b"ab\ncde\r\n\nf", dtype=np.uint8))
+    assert list(starts) == [0, 3, 8, 9]
+    assert list(lengths) == [2, 3, 0, 1]
+
+
+def test_records(ragged_file):
+    with FixedWidthFile(ragged_file) as data:
+        assert len(data) == 4
+        assert list(data.records()) == [
+            b"Pab1 0012",
+            b"Pcd2 0030",
+            b"Hxxxxx",
+            b"Pab1 0001",
+        ]
+        assert data.record(2) == b"Hxxxxx"
+
+
+def test_column_is_zero_copy_for_uniform_records(uniform_file):
+    data = FixedWidthFile(uniform_file)
+    assert data.stride() == 5
+    col = data.column(2, 2)
+    assert list(col) == [b"01", b"02", b"03"]
+    assert not col.flags.owndata
+
+
+def test_columns(ragged_file):
+    data = FixedWidthFile(ragged_file)
+    assert data.stride() is None
+    assert list(data.column(1, 1)) == [b"P", b"P", b"H", b"P"]
+    assert data.columns([(2, 2), (4, 1)])[1] == b"cd2"
+    with pytest.raises(ValueError, match="out of range"):
+        data.column(6, 4)
+
+
+def test_columns_uniform(uniform_file):
+    data = FixedWidthFile(uniform_file)
+    assert not data.columns([(2, 2)]).flags.owndata
+    assert list(data.columns([(4, 1), (1, 2)])) == [b"AP0", b"BH0", b"CP0"]
+    # A subset of every other record is uniform too, with twice the stride
+    people = data.subset(data.rectype_mask("P"))
+    assert people.stride() == 10
+    assert list(people.columns([(2, 2), (4, 1)])) == [b"01A", b"03C"]
+
+
+def test_rectype_mask_and_subset(ragged_file):
+    data = FixedWidthFile(ragged_file)
+    assert list(data.rectype_mask("P")) == [True, True, False, True]
+    assert list(data.rectype_mask("xx", 7, 2)) == [False, False, False, False]
+    people = data.subset(data.rectype_mask("P"))
+    assert list(people.column(6, 4)) == [b"0012", b"0030", b"0001"]
+
+
+def test_gzip_and_bytes(tmp_path):
+    gz_file = tmp_path / "data.dat.gz"
+    with gzip.open(gz_file, "wb") as f:
+        f.write(b"P01A\nH02B\n")
+    assert list(FixedWidthFile(gz_file).column(4, 1)) == [b"A", b"B"]
+    assert list(FixedWidthFile.from_bytes(b"P01A\nH02B\n").column(2, 2)) == [
+        b"01",
+        b"02",
+    ]
+
+
+def test_empty_file(tmp_path):
+    empty = tmp_path / "empty.dat"
+    empty.write_bytes(b"")
+    assert len(FixedWidthFile(empty)) == 0
+
+
+def test_record_blocks():
+    f = io.BytesIO(b"abc\nde\r\nfghij\nk")
+    blocks = [list(data.records()) for data in record_blocks(f, block_size=4)]
+    assert [r for block in blocks for r in block] == [b"abc", b"de", b"fghij", b"k"]
+    assert len(blocks) > 1
+
+
+def test_data_blocks(tmp_path, uniform_file):
+    assert [len(data) for data in data_blocks(uniform_file)] == [3]
+    gz_file = tmp_path / "data.dat.gz"
+    with gzip.open(gz_file, "wb") as f:
+        f.write(b"P01A\nH02B\nP03C\n")
+    blocks = list(data_blocks(gz_file, block_size=6))
+    assert len(blocks) > 1
+    assert [r for data in blocks for r in data.records()] == [
+        b"P01A",
+        b"H02B",
+        b"P03C",
+    ]
+    with gzip.open(gz_file, "wb") as f:
+        f.write(b"")
+    assert [len(data) for data in data_blocks(gz_file)] == [0]
@@ -1,5 +1,173 @@
-from ipums.tools.freq_quick import main
+import gzip
+import numpy as np
+from argparse import Namespace
+import pytest
+from ipums.tools import freq_quick, gzip_index, result_cache
+from ipums.tools.fixed_width import FixedWidthFile
+from ipums.tools.freq_quick import (
+    FreqQuick,
+    count_data_file,
+    main,
+    shard_ranges,
+    stitch,
+    tabulate,
+)
 
 
 def test_help_smoke(check_help_msg):
     check_help_msg("freq_quick", main, ["--help", "freq_quick_rust.rs", "frequencies"])
+
+
+@pytest.fixture
+def fixed_width_file(tmp_path):
+    data_file = tmp_path / "freq.dat"
+    data_file.write_bytes(b"Pab1 0012\nPcd2 0030\nHxxxxx\nPab1 0001\n")
+    return data_file
+
+
+def test_tabulate(fixed_width_file):
+    data = FixedWidthFile(fixed_width_file)
+    data = data.subset(data.rectype_mask("P"))
+    keys = data.columns([(2, 2), (4, 1)])
+
+    df = tabulate(keys, [2, 1])
+    assert df.columns == ["column_0", "column_1", "Frequency"]
+    assert df.rows() == [("ab", "1", 2), ("cd", "2", 1)]
+
+    weights = data.column(6, 4).astype(np.float64)
+    df = tabulate(keys, [2, 1], weights, 10)
+    assert df.rows() == [("ab", "1", 1.3), ("cd", "2", 3.0)]
+
+
+def make_freq_quick(data_file, passthru, **opts):
+    defaults = dict(
+        data_source=str(data_file),
+        project=None,
+        rectype=None,
+        sample=None,
+        variable_names=None,
+        svar=None,
+        ovar=None,
+        output_data=False,
+        wsvar=None,
+        wvar=None,
+        wovar=None,
+        wd=None,
+        separately=False,
+        joint=False,
+        out_dir=".",
+        format="tsv",
+        jobs=1,
+        no_cache=True,
+        cache_size=None,
+    )
+    defaults.update(opts)
+    return FreqQuick({"opts": Namespace(**defaults), "passthru": passthru})
+
+
+def test_compute_passthru_locations(fixed_width_file):
+    fq = make_freq_quick(fixed_width_file, ["2", "2", "4", "1", "-r", "P"])
+    assert fq.locs == [(2, 2), (4, 1)]
+    assert fq.compute().rows() == [("ab", "1", 2), ("cd", "2", 1)]
+    assert fq.lines_examined == 3
+
+
+def test_bytes_undefined_in_cp1252(tmp_path):
+    data_file = tmp_path / "freq.dat"
+    data_file.write_bytes(b"P\x81b1\n")
+    fq = make_freq_quick(data_file, ["2", "2", "-r", "P"])
+    assert fq.compute().rows() == [("\x81b", 1)]
+
+
+def test_separately(fixed_width_file, tmp_path):
+    out_dir = tmp_path / "out"
+    fq = make_freq_quick(
+        fixed_width_file,
+        ["2", "2", "4", "1", "-r", "P"],
+        separately=True,
+        joint=True,
+        out_dir=str(out_dir),
+    )
+    tables = fq.compute_separately(joint=True)
+    assert list(tables) == ["2_2", "4_1", "joint"]
+    assert tables["2_2"].rows() == [("ab", 2), ("cd", 1)]
+    assert tables["4_1"].rows() == [("1", 2), ("2", 1)]
+    assert tables["joint"].equals(fq.compute())
+
+    fq.run()
+    assert sorted(p.name for p in out_dir.iterdir()) == [
+        "2_2.tsv",
+        "4_1.tsv",
+        "joint.tsv",
+    ]
+
+
+def test_shard_ranges(fixed_width_file):
+    assert shard_ranges(fixed_width_file, 1) == [(0, 37)]
+    assert shard_ranges(fixed_width_file, 2) == [(0, 20), (20, 37)]
+    assert shard_ranges(fixed_width_file, 10) == [(0, 10), (10, 20), (20, 27), (27, 37)]
+
+
+def test_stitch():
+    assert stitch([(b"ab\n", b"c"), (b"d",), (b"e\n", b"")]) == b"ab\ncde\n"
+
+
+def test_shard_counter(monkeypatch):
+    monkeypatch.setattr(freq_quick, "SCAN_CHUNK", 8)
+    spec = ([[(1, 1)]], None, None)
+    counter = freq_quick.ShardCounter(spec)
+    for piece in [b"a", b"b\nP1\nH", b"2\nP3\nP4", b"\nH", b"5\nP"]:
+        counter.feed(piece)
+    n, counts, pieces = counter.result()
+    assert n == 5
+    assert list(counts[0][0]) == [b"H", b"P"]
+    assert list(counts[0][1]) == [2, 3]
+    assert pieces == (b"ab\n", b"P")
+
+    counter = freq_quick.ShardCounter(spec)
+    counter.feed(b"abc")
+    assert counter.result()[::2] == (0, (b"abc",))
+
+
+@pytest.mark.parametrize("jobs", [2, 3, 8])
+def test_jobs_match_serial(fixed_width_file, jobs):
+    spec = ([[(2, 2), (4, 1)], [(1, 1)]], ("P", 1, 1), (6, 4))
+    serial = count_data_file(fixed_width_file, spec, 1)
+    sharded = count_data_file(fixed_width_file, spec, jobs)
+    assert serial[0] == sharded[0] == 3
+    for (values, sums), (s_values, s_sums) in zip(serial[1], sharded[1]):
+        assert list(values) == list(s_values)
+        assert list(sums) == list(s_sums)
+
+
+def test_jobs_match_serial_gzip(tmp_path, monkeypatch):
+    monkeypatch.setattr(gzip_index, "INDEX_DIR", tmp_path / "index")
+    lines = [b"P%02d %04d\n" % (i % 7, i) for i in range(500)]
+    data_file = tmp_path / "freq.dat.gz"
+    # Members deliberately end mid-record
+    blob = b"".join(lines)
+    data_file.write_bytes(
+        b"".join(gzip.compress(blob[i : i + 97]) for i in range(0, len(blob), 97))
+    )
+    spec = ([[(2, 2)]], None, (5, 4))
+    serial = count_data_file(data_file, spec, 1)
+    # The first parallel count builds the member index, later ones reuse it
+    assert gzip_index.load_index(data_file) is None
+    for _ in range(2):
+        sharded = count_data_file(data_file, spec, 4)
+        assert len(gzip_index.load_index(data_file)) > 4
+        assert sharded[0] == serial[0] == 500
+        assert list(sharded[1][0][0]) == list(serial[1][0][0])
+        assert list(sharded[1][0][1]) == list(serial[1][0][1])
+
+
+def test_cache(fixed_width_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_ROOT", tmp_path / "cache")
+    fq = make_freq_quick(fixed_width_file, ["2", "2", "-r", "P"], no_cache=False)
+    expected = fq.compute()
+    assert len(list((tmp_path / "cache" / "freq_quick").iterdir())) == 1
+
+    # A cache hit never opens the data file
+    monkeypatch.setattr(freq_quick, "count_data_file", None)
+    assert fq.compute().equals(expected)
+    assert fq.lines_examined == 3
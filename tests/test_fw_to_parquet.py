@@ -0,0 +1,119 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pytest
+import ipums.tools.fw_to_parquet as ftp
+from ipums.tools.fixed_width import FixedWidthFile
+from ipums.tools import sps_parse
+from ipums.tools.freq_quick import count_data_file
+from ipums.tools.statfile_dd import write_dd
+
+LAYOUT = [
+    ("P", "AGE", 2, 2),
+    ("P", "SEX", 4, 1),
+    ("P", "WT", 6, 1),
+    ("H", "SIZE", 2, 3),
+]
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    data_file = tmp_path / "sample.dat"
+    data_file.write_bytes(b"P121 3\nP111 1\nH123 9\nP222 2\nP121 4\n")
+    return data_file
+
+
+def converted(data_file):
+    written = ftp.convert(data_file, LAYOUT)
+    # Make sure the copy is newer than the data file
+    stat = os.stat(data_file)
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+    return written
+
+
+def test_help_smoke(check_help_msg):
+    check_help_msg("fw_to_parquet", ftp.main, ["--help", "Parquet"])
+
+
+def test_layout_from_tsv(tmp_path):
+    dd = tmp_path / "dd.tsv"
+    dd.write_text(
+        "RecordType\tVar\tCol\tWid\tValue\n"
+        "P\tAGE\t2\t2\t\n"
+        "\t\t\t\t01\n"
+        "H\tSIZE\t2\t3\t\n"
+    )
+    assert ftp.layout_from_tsv(dd) == [("P", "AGE", 2, 2), ("H", "SIZE", 2, 3)]
+
+
+def test_rectangular_dd_round_trip(tmp_path):
+    syntax = tmp_path / "r.sps"
+    syntax.write_text("data list\n  AGE 1-2\n  SEX 3-3\n.\n")
+    dd = tmp_path / "r.tsv"
+    write_dd(sps_parse.parse(syntax), dd)
+    layout = ftp.layout_from_tsv(dd)
+    assert layout == [("", "age", 1, 2), ("", "sex", 3, 1)]
+    data_file = tmp_path / "r.dat"
+    data_file.write_bytes(b"121\n452\n121\n")
+    written = ftp.convert(data_file, layout)
+    assert [p.name for p in written] == ["_all.parquet"]
+    stat = os.stat(data_file)
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+    columns = ftp.open_columns(data_file, [(1, 2), (3, 1)], None)
+    assert list(columns.columns([(1, 2), (3, 1)])) == [b"121", b"452", b"121"]
+
+
+def test_cover():
+    stored = [(2, 2), (4, 1), (6, 1)]
+    assert ftp.cover(stored, 2, 2) == [((2, 2), 0, 2)]
+    assert ftp.cover(stored, 3, 2) == [((2, 2), 1, 1), ((4, 1), 0, 1)]
+    assert ftp.cover(stored, 4, 2) is None
+
+
+def test_decode_row_groups():
+    column = pa.chunked_array(
+        [ftp.encode(np.array([b"b", b"c"])), ftp.encode(np.array([b"a", b"c"]))]
+    )
+    values, indices = ftp.decode(column, 1)
+    assert list(values) == [b"a", b"b", b"c"]
+    assert list(values[indices]) == [b"b", b"c", b"a", b"c"]
+
+
+def test_convert_round_trip(data_file):
+    written = converted(data_file)
+    assert sorted(p.name for p in written) == ["H.parquet", "P.parquet"]
+    text = FixedWidthFile(data_file)
+    text = text.subset(text.rectype_mask("P"))
+    columns = ftp.open_columns(data_file, [(2, 2), (3, 2), (6, 1)], ("P", 1, 1))
+    assert len(columns) == 4
+    for loc in [(2, 2), (3, 2), (6, 1)]:
+        assert (columns.column(*loc) == text.column(*loc)).all()
+    assert list(columns.columns([(4, 1), (2, 1)])) == [b"11", b"11", b"22", b"11"]
+
+
+def test_open_columns_fallback(data_file):
+    assert ftp.open_columns(data_file, [(2, 2)], ("P", 1, 1)) is None
+    converted(data_file)
+    # Not stored, or not every record when unfiltered
+    assert ftp.open_columns(data_file, [(5, 1)], ("P", 1, 1)) is None
+    columns = ftp.open_columns(data_file, [(2, 1)])
+    assert sorted(columns.column(2, 1)) == [b"1", b"1", b"1", b"1", b"2"]
+    assert ftp.open_columns(data_file, [(2, 2)], ("X", 1, 1)) is None
+    # Stale once the data file changes
+    data_file.write_bytes(data_file.read_bytes())
+    assert ftp.open_columns(data_file, [(2, 2)], ("P", 1, 1)) is None
+
+
+def test_count_data_file_uses_copy(data_file, monkeypatch):
+    spec = ([[(2, 2)], [(2, 2), (4, 1)]], ("P", 1, 1), (6, 1))
+    expected = count_data_file(data_file, spec)
+    converted(data_file)
+    monkeypatch.setattr(ftp, "FixedWidthFile", None)
+    import ipums.tools.freq_quick as fq
+
+    monkeypatch.setattr(fq, "FixedWidthFile", None)
+    n, counts = count_data_file(data_file, spec)
+    assert n == expected[0] == 4
+    for (values, sums), (ev, es) in zip(counts, expected[1]):
+        assert (values == ev).all()
+        assert np.allclose(sums, es)
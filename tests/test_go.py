@@ -3,9 +3,12 @@ import argparse
 import os
 import re
 import getpass
+import subprocess
+import sys
 from collections import OrderedDict
 import ipums.tools.go as go  ## Fix this
 import tempfile as tf
+import time
 
 
 class ExampleClass:
@@ -197,3 +200,136 @@ def test_go_go():
     assert go.go_go(
         test.name, {"testKey": "testPath", "testKey2": "testPath2"}, parser, c
     ) == go.show_go_paths(test.name)
+
+
+def test_go_store(tmp_path):
+    with go.GoStore(str(tmp_path / "go.db")) as store:
+        store["cps"] = "/pkg/ipums/cps"
+        store["cps/rr-test"] = "/mnt/rds/cps/workspaces/rr-test"
+        store["usa"] = "/pkg/ipums/usa"
+        store["cps"] = "/pkg/ipums/cps2"
+        assert store["cps"] == "/pkg/ipums/cps2"
+        assert list(store) == ["cps", "cps/rr-test", "usa"]
+        assert len(store) == 3
+        store.rename("usa", "us")
+        assert "usa" not in store and store["us"] == "/pkg/ipums/usa"
+        with pytest.raises(KeyError):
+            store.rename("usa", "x")
+        del store["us"]
+        with pytest.raises(KeyError):
+            del store["us"]
+        assert store.with_prefix("cps") == ["cps", "cps/rr-test"]
+        assert store.with_prefix("cps/") == ["cps/rr-test"]
+        assert store.similar("cpz") == ["cps"]
+    # Changes are saved as they are made
+    with go.GoStore(str(tmp_path / "go.db")) as store:
+        assert store.items() == [
+            ("cps", "/pkg/ipums/cps2"),
+            ("cps/rr-test", "/mnt/rds/cps/workspaces/rr-test"),
+        ]
+
+
+def test_go_store_migration(tmp_path):
+    godata = tmp_path / "go_user.dat"
+    go.write_go_paths(str(godata), {"pkg": "/pkg", "cps": "/pkg/ipums/cps"})
+    with go.GoStore(go.store_file(godata), legacy_file=str(godata)) as store:
+        assert dict(store.items()) == {"pkg": "/pkg", "cps": "/pkg/ipums/cps"}
+        del store["pkg"]
+    # The data file is only read when the store is made
+    with go.GoStore(go.store_file(godata), legacy_file=str(godata)) as store:
+        assert list(store) == ["cps"]
+
+
+def add_keys(path, worker):
+    with go.GoStore(path) as store:
+        for i in range(50):
+            store[f"key{worker}_{i}"] = f"/path/{worker}/{i}"
+
+
+def test_go_store_concurrent(tmp_path):
+    import multiprocessing
+
+    path = str(tmp_path / "go.db")
+    go.GoStore(path).close()
+    workers = [
+        multiprocessing.Process(target=add_keys, args=(path, w)) for w in range(4)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+        assert w.exitcode == 0
+    with go.GoStore(path) as store:
+        assert len(store) == 200
+
+
+def test_go_go_store(tmp_path, capsys):
+    parser = go.run_parser(test.name)
+    with go.GoStore(str(tmp_path / "go.db")) as store:
+        store.update({"cps": "/pkg/ipums/cps", "usa": "/pkg/ipums/usa"})
+        a = ExampleClass([["us", "cpz", "c"]], "a", "a", "a", "a", "a")
+        assert go.go_go(test.name, store, parser, a) == [
+            "/pkg/ipums/usa",
+            "/pkg/ipums/cps",
+        ]
+        out = capsys.readouterr().out
+        assert "Invalid Key: cpz\nDid you mean: cps\n" in out
+
+
+def test_go_store_startup_budget(tmp_path):
+    """Opening the store and looking up a key, as every `go KEY` does, must
+    stay fast however many keys there are."""
+    path = str(tmp_path / "go.db")
+    with go.GoStore(path) as store, store.transaction():
+        for i in range(10000):
+            store[f"key{i:05d}"] = f"/path/{i}"
+    runs = 50
+    start = time.perf_counter()
+    for i in range(runs):
+        with go.GoStore(path) as store:
+            assert go.find_key(store, f"key{i * 199:05d}") is not None
+            assert go.find_key(store, "key0999") is None
+    assert (time.perf_counter() - start) / runs < 0.02
+
+
+# Modules go must not import up front, since it runs inside every `cd`
+HEAVY_MODULES = ["ipums.metadata", "pandas", "numpy", "polars"]
+# Budget in microseconds for `import ipums.tools.go`, from -X importtime
+IMPORT_BUDGET_US = 150_000
+
+
+def test_import_time():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import ipums.tools.go"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "[us]" not in line:
+            _, cumulative, name = line.split("|")
+            imports[name.strip()] = int(cumulative)
+    assert [m for m in HEAVY_MODULES if m in imports] == []
+    assert imports["ipums.tools.go"] < IMPORT_BUDGET_US
+
+
+def test_project_path(tmp_path, monkeypatch):
+    from ipums.tools import result_cache
+
+    monkeypatch.setattr(result_cache, "CACHE_ROOT", tmp_path / "cache")
+    looked_up = []
+
+    class FakeIPUMS:
+        def __init__(self, project):
+            looked_up.append(project)
+            self.project = argparse.Namespace(path=f"/pkg/ipums/{project}")
+
+    monkeypatch.setitem(
+        sys.modules, "ipums.metadata", argparse.Namespace(IPUMS=FakeIPUMS)
+    )
+    assert go.project_path("cps") == "/pkg/ipums/cps"
+    assert go.project_path("cps") == "/pkg/ipums/cps"
+    assert looked_up == ["cps"]
+    assert go.project_path("cps", refresh=True) == "/pkg/ipums/cps"
+    assert looked_up == ["cps", "cps"]
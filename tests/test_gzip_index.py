@@ -0,0 +1,82 @@
+import gzip
+import pytest
+import ipums.tools.gzip_index as gzi
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(gzi, "INDEX_DIR", tmp_path / "index")
+    return tmp_path / "index"
+
+
+@pytest.fixture
+def multi_member(tmp_path):
+    # Stored (level 0) members keep the gzip signature inside the data
+    # literally, which gives the member search false candidates to reject.
+    chunks = [b"P01A\nH02" + gzi.GZIP_MAGIC, b"B\nP03C\n", b"H04D\n" * 1000]
+    members = [gzip.compress(c, compresslevel=0) for c in chunks]
+    path = tmp_path / "multi.dat.gz"
+    path.write_bytes(b"".join(members))
+    return path, b"".join(chunks), [0, len(members[0]), len(members[0] + members[1])]
+
+
+def test_candidate_offsets(multi_member):
+    path, _, members = multi_member
+    offsets = gzi.candidate_offsets(path)
+    assert set(members) < set(offsets)
+
+
+def test_inflate_member(multi_member):
+    path, expected, members = multi_member
+    length, data = gzi.inflate_member(path, 0)
+    assert length == members[1]
+    assert data == expected[: len(data)]
+    assert gzi.inflate_member(path, length)[1].startswith(b"B\nP03C")
+    assert gzi.inflate_member(path, 1) == (None, None)
+
+
+def test_member_length(multi_member):
+    path, _, members = multi_member
+    assert gzi.member_length(path, members[1]) == members[2] - members[1]
+    assert gzi.member_length(path, 1) is None
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_member_index(multi_member, jobs):
+    path, _, members = multi_member
+    assert gzi.member_index(path, jobs) == members
+    assert gzi.load_index(path) == members
+
+
+def test_read_gzip(multi_member, index_dir):
+    path, expected, members = multi_member
+    assert gzi.read_gzip(path, jobs=2) == expected
+    assert gzi.load_index(path) == members
+    assert len(list(index_dir.iterdir())) == 1
+    # Second read starts from the saved index
+    assert gzi.read_gzip(path, jobs=2) == expected
+
+
+def test_index_invalidated_by_change(multi_member):
+    path, _, _ = multi_member
+    gzi.save_index(path, [0])
+    assert gzi.load_index(path) == [0]
+    path.write_bytes(gzip.compress(b"P01A\n"))
+    assert gzi.load_index(path) is None
+    assert gzi.read_gzip(path, jobs=2) == b"P01A\n"
+
+
+def test_single_member(tmp_path):
+    path = tmp_path / "single.dat.gz"
+    path.write_bytes(gzip.compress(b"P01A\n" * 100))
+    assert gzi.read_gzip(path) == b"P01A\n" * 100
+
+
+def test_single_member_with_false_candidates(tmp_path):
+    # One stored member whose data holds the gzip signature
+    data = (b"P01A" + gzi.GZIP_MAGIC + b"\n") * 100
+    path = tmp_path / "single.dat.gz"
+    path.write_bytes(gzip.compress(data, compresslevel=0))
+    assert len(gzi.candidate_offsets(path)) > 1
+    assert gzi.member_index(path, 2) == [0]
+    assert gzi.read_gzip(path, jobs=2) == data
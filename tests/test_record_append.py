@@ -0,0 +1,61 @@
+import gzip
+import sys
+import pytest
+from ipums.tools.record_append import *
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    input_file = tmp_path / "input.dat"
+    input_file.write_bytes(b"".join(b"P%02d\n" % i for i in range(12)) + b"\nH99")
+    return input_file
+
+
+def test_help_smoke(check_help_msg):
+    check_help_msg("record_append", main, ["--help", "LINENUM"])
+
+
+def test_count_lines(input_file, tmp_path):
+    assert count_lines(input_file) == 14
+    gz = tmp_path / "input.dat.gz"
+    with gzip.open(gz, "wb") as f:
+        f.write(input_file.read_bytes() + b"\n")
+    assert count_lines(gz) == 14
+    empty = tmp_path / "empty.dat"
+    empty.write_bytes(b"")
+    assert count_lines(empty) == 0
+
+
+@pytest.mark.parametrize("output", ["output.dat", "output.dat.gz"])
+def test_main(input_file, tmp_path, monkeypatch, capsys, output):
+    output_file = tmp_path / output
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["record_append", "--input_file", str(input_file)]
+        + ["--output_file", str(output_file), "--append_position", "2"]
+        + ["--append", "-", "LINENUM", "-"],
+    )
+    main()
+    assert capsys.readouterr().out == "LINENUM width is set to 2\n"
+    opener = gzip.open if output.endswith(".gz") else open
+    with opener(output_file, "rb") as f:
+        lines = f.read().split(b"\n")
+    assert lines[:2] == [b"P-01-00", b"P-02-01"]
+    assert lines[-3:] == [b"", b"H-14-99", b""]
+
+
+def test_linenum_width(input_file, tmp_path):
+    args = build_parser().parse_args(
+        ["--input_file", str(input_file), "--output_file", str(tmp_path / "out")]
+        + ["--append", "LINENUM", "--append_position", "1", "--linenum-width", "4"]
+    )
+    assert record_append(args) == 4
+    assert (tmp_path / "out").read_bytes().startswith(b"0001P00\n0002P01\n")
+    args.linenum_width = 1
+    with pytest.raises(ValueError, match="wider than the LINENUM width"):
+        record_append(args)
+    args.linenum_width = None
+    args.append_position = 5
+    with pytest.raises(ValueError, match="shorter than the append position"):
+        record_append(args)
@@ -0,0 +1,66 @@
+import os
+import ipums.tools.result_cache as rc
+
+
+def test_get_put(tmp_path):
+    cache = rc.ResultCache("test", root=tmp_path)
+    key = cache.key(data=["/a/file", 1, 2], spec=[(1, 2)])
+    assert key == cache.key(spec=[[1, 2]], data=["/a/file", 1, 2])
+    assert key != cache.key(data=["/a/file", 1, 3], spec=[(1, 2)])
+    assert cache.get(key) is None
+    cache.put(key, {"table": [1, 2, 3]})
+    assert cache.get(key) == {"table": [1, 2, 3]}
+
+
+def test_damaged_entry_is_a_miss(tmp_path):
+    cache = rc.ResultCache("test", root=tmp_path)
+    cache.put("abc", 1)
+    cache.path("abc").write_bytes(b"not a pickle")
+    assert cache.get("abc") is None
+    assert not cache.path("abc").exists()
+
+
+def test_stale_class_is_a_miss(tmp_path):
+    cache = rc.ResultCache("test", root=tmp_path)
+    # A pickle of a class from a module that no longer exists
+    cache.path("abc").parent.mkdir(parents=True)
+    cache.path("abc").write_bytes(b"cipums.tools.no_such_module\nThing\n.")
+    assert cache.get("abc") is None
+    assert not cache.path("abc").exists()
+
+
+def test_lru_eviction(tmp_path):
+    cache = rc.ResultCache("test", max_mb=3.5 / 1024, root=tmp_path)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, b"x" * 1000)
+        os.utime(cache.path(key), (i, i))
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") is not None
+    cache.put("d", b"x" * 1000)
+    assert sorted(p.stem for p in (tmp_path / "test").glob("*.pkl")) == [
+        "a",
+        "c",
+        "d",
+    ]
+
+
+def test_budget_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("IPUMS_CLI_CACHE_MB", "2")
+    assert rc.ResultCache("test", root=tmp_path).max_bytes == 2 * 2**20
+
+
+def test_file_fingerprint(tmp_path):
+    data_file = tmp_path / "data.dat"
+    data_file.write_bytes(b"P01\n")
+    before = rc.file_fingerprint(data_file)
+    data_file.write_bytes(b"P01\nP02\n")
+    assert rc.file_fingerprint(data_file) != before
+
+
+def test_content_hash(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.write_bytes(b"x" * 100)
+    b.write_bytes(b"x" * 100)
+    assert rc.content_hash(a, block_size=7) == rc.content_hash(b)
+    b.write_bytes(b"x" * 99 + b"y")
+    assert rc.content_hash(a) != rc.content_hash(b)
@@ -1,5 +1,9 @@
+import gzip
+import io
+import sys
 import pytest
 from ipums.tools.right_pad import *
+from ipums.tools.fixed_width import FixedWidthFile
 from dataclasses import dataclass
 from typing import List
 
@@ -159,3 +163,127 @@ def test_read_df(test_data_dir):
     )
     with pytest.raises(FileNotFoundError, match="Unable to find"):
         ol = read_data_file(df4)
+
+
+@pytest.mark.parametrize("name", ["pad.txt", "pad.txt.gz"])
+def test_main_rewrites_in_place(tmp_path, monkeypatch, name):
+    data_file = tmp_path / name
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(data_file, "wb") as f:
+        f.write(b"a1\r\nb22\nc\n")
+    monkeypatch.setattr(sys, "argv", ["right_pad", str(data_file), "--len", "4"])
+    main()
+    with opener(data_file, "rb") as f:
+        assert f.read() == b"a1  \nb22 \nc   \n"
+    assert [p.name for p in tmp_path.iterdir()] == [name]
+
+
+def test_main_failure_keeps_original(tmp_path, monkeypatch):
+    data_file = tmp_path / "pad.txt"
+    data_file.write_bytes(b"a1\nb22222\n")
+    monkeypatch.setattr(sys, "argv", ["right_pad", str(data_file), "--len", "4"])
+    with pytest.raises(ValueError, match="Given line len"):
+        main()
+    assert data_file.read_bytes() == b"a1\nb22222\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["pad.txt"]
+
+
+def test_main_stdin(monkeypatch, capsysbinary):
+    stdin = io.TextIOWrapper(io.BytesIO(b"a1\nb22\n"))
+    monkeypatch.setattr(sys, "stdin", stdin)
+    monkeypatch.setattr(sys, "argv", ["right_pad", "-", "--len", "3"])
+    main()
+    assert capsysbinary.readouterr().out == b"a1 \nb22\n"
+
+
+def test_target_lengths():
+    data = FixedWidthFile.from_bytes(b"Pa1\nHb\nPb22\n")
+    args = ExampleArgs(rt=["P", "H"], rt_len=[5, 3], s=1, w=1)
+    assert target_lengths(data, args).tolist() == [5, 3, 5]
+    args = ExampleArgs(rt=["Pa", "Hb", "Pb"], rt_len=[4, 3, 6], s=1, w=2)
+    assert target_lengths(data, args).tolist() == [4, 3, 6]
+    args = ExampleArgs(rt=["Pa", "Hb"], rt_len=[4, 3], s=1, w=2)
+    with pytest.raises(ValueError, match="Could not find any matching rectype"):
+        target_lengths(data, args)
+
+
+def test_pad_block():
+    data = FixedWidthFile.from_bytes(b"Pa1\n\nHb\r\nPb22")
+    targets = np.array([5, 2, 3, 4])
+    assert pad_block(data, targets, ord("x")) == b"Pa1xx\nxx\nHbx\nPb22\n"
+
+
+@pytest.mark.parametrize(
+    "data, padded",
+    [
+        (b"Pa1 \nHb \n", True),
+        (b"Pa1\nHb \n", False),
+        (b"Pa1 \r\nHb \n", False),
+        (b"Pa1 \nHb ", False),
+        (b"", True),
+    ],
+)
+def test_already_padded(data, padded):
+    args = ExampleArgs(rt=["P", "H"], rt_len=[4, 3], s=1, w=1)
+    assert already_padded(io.BytesIO(data), args) == padded
+
+
+def test_padded_file_not_rewritten(tmp_path, monkeypatch):
+    data_file = tmp_path / "pad.txt"
+    data_file.write_bytes(b"Pa1 \nHb  \n")
+    monkeypatch.setattr(tempfile, "mkstemp", None)
+    report = {}
+    args = ExampleArgs(data_file=data_file, len=4, s=1, w=1)
+    assert rewrite_data_file(args, report) == (False, 0)
+    assert report == {"H": [1, 4], "P": [1, 4]}
+
+
+def test_report(tmp_path, monkeypatch, capsys):
+    data_file = tmp_path / "pad.txt"
+    data_file.write_bytes(b"Pa1\nHb\nPb22\n")
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["right_pad", str(data_file), "--len", "6", "-s", "1", "-w", "1", "--report"],
+    )
+    main()
+    assert capsys.readouterr().err.splitlines() == [
+        "rectype\trecords\tlongest",
+        "H\t1\t2",
+        "P\t2\t4",
+        "Longest line: 4",
+    ]
+
+
+def test_expand_data_files(tmp_path):
+    for name in ["a.dat", "b.dat.gz", "c.txt"]:
+        (tmp_path / name).write_bytes(b"")
+    a, b, c = (str(tmp_path / name) for name in ["a.dat", "b.dat.gz", "c.txt"])
+    assert expand_data_files([str(tmp_path)]) == [a, b]
+    assert expand_data_files([str(tmp_path / "*.txt"), c, a]) == [c, a]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_main_many_files(tmp_path, monkeypatch, capsys, jobs):
+    (tmp_path / "a.dat").write_bytes(b"Pa1\nHb\n")
+    with gzip.open(tmp_path / "b.dat.gz", "wb") as f:
+        f.write(b"Pa1\n")
+    (tmp_path / "c.dat").write_bytes(b"Pa12\nHbb\n")
+    padded = (tmp_path / "c.dat").stat().st_mtime_ns
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["right_pad", str(tmp_path), "--rt", "P", "H", "--rt_len", "4", "3"]
+        + ["-s", "1", "-w", "1", "-j", jobs],
+    )
+    main()
+    assert (tmp_path / "a.dat").read_bytes() == b"Pa1 \nHb \n"
+    assert gzip.open(tmp_path / "b.dat.gz").read() == b"Pa1 \n"
+    assert (tmp_path / "c.dat").stat().st_mtime_ns == padded
+    assert capsys.readouterr().err.splitlines() == [
+        "Files: 3, changed: 2, already padded: 1, bytes written: 14",
+        "rectype\trecords\tlongest",
+        "H\t2\t3",
+        "P\t3\t4",
+        "Longest line: 4",
+    ]
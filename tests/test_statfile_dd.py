@@ -0,0 +1,109 @@
+import pytest
+import polars as pl
+from ipums.tools import result_cache, statfile_dd
+from ipums.tools.do_parse import DataList, ValueLabel
+from ipums.tools.statfile_dd import *
+
+
+def test_build_dd():
+    age = DataList("P", "AGE", "2", "4")
+    age.label = "Age"
+    age.valuelabels = [ValueLabel("AGE", "999", "Missing").to_row()]
+    name = DataList("P", "NAME", "5", None, "a")
+    name.label = "Name"
+    df = build_dd([age, name])
+    assert df.columns == DD_COLUMNS
+    assert df.schema == DD_SCHEMA
+    assert df.select(PARSED_COLUMNS).rows() == [
+        ("P", "age", "2", "3", "", "", "Age", "", "Age", ""),
+        ("", "", "", "", "", "999", "", "Missing", "", "Missing"),
+        ("P", "name", "5", "1", "a", "", "Name", "", "Name", ""),
+    ]
+    assert df["ValueLabelSvar"].to_list() == ["", "Missing", ""]
+    assert df["Freq"].null_count() == 3
+
+
+def test_build_dd_empty():
+    df = build_dd([])
+    assert df.shape == (0, 33)
+
+
+def parsed_vars():
+    age = DataList("P", "AGE", "2", "4")
+    age.label = 'Age "in years"'
+    age.valuelabels = [ValueLabel("AGE", "999", "Missing").to_row()]
+    name = DataList("P", "NAME", "5", None, "a")
+    name.label = "Name"
+    return [age, name]
+
+
+def test_write_dd_tsv(tmp_path, capsys):
+    expected = build_dd(parsed_vars()).write_csv(separator="\t")
+    write_dd(parsed_vars())
+    assert capsys.readouterr().out == expected
+    write_dd(parsed_vars(), tmp_path / "dd.tsv")
+    assert (tmp_path / "dd.tsv").read_text() == expected
+
+
+def test_write_dd_parquet(tmp_path, monkeypatch):
+    monkeypatch.setattr("ipums.tools.statfile_dd.BATCH_ROWS", 2)
+    write_dd(parsed_vars(), tmp_path / "dd.parquet")
+    assert pl.read_parquet(tmp_path / "dd.parquet").equals(build_dd(parsed_vars()))
+
+
+def test_write_dd_xlsx(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    write_dd(parsed_vars(), tmp_path / "dd.xlsx")
+    rows = list(openpyxl.load_workbook(tmp_path / "dd.xlsx").active.values)
+    assert list(rows[0]) == DD_COLUMNS
+    assert rows[2][:10] == ("",) * 5 + ("999", "", "Missing", "", "Missing")
+    assert rows[2][10] is None
+    assert rows[3][1] == "name"
+
+
+def test_cached_parse(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_ROOT", tmp_path / "cache")
+    calls = []
+
+    def parse(filename):
+        calls.append(filename)
+        return parsed_vars()
+
+    syntax = tmp_path / "a.do"
+    syntax.write_text("label var age")
+    first = cached_parse(parse, syntax)
+    # A copy of the file with the same contents is not parsed again
+    copy = tmp_path / "b.do"
+    copy.write_text("label var age")
+    again = cached_parse(parse, copy)
+    assert calls == [syntax]
+    assert [dl.name for dl in again] == [dl.name for dl in first]
+    assert again[0].valuelabels == first[0].valuelabels
+    syntax.write_text("label var name")
+    cached_parse(parse, syntax)
+    cached_parse(parse, syntax, no_cache=True)
+    assert calls == [syntax, syntax, syntax]
+
+
+def test_cached_parse_tracks_sections(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_ROOT", tmp_path / "cache")
+    calls = []
+
+    def parse(filename):
+        calls.append(filename)
+        return parsed_vars()
+
+    syntax = tmp_path / "a.sps"
+    syntax.write_text("data list")
+    cached_parse(parse, syntax)
+    cached_parse(parse, syntax)
+    assert len(calls) == 1
+    # Editing the shared section scanner invalidates earlier parses
+    content_hash = statfile_dd.content_hash
+    monkeypatch.setattr(
+        statfile_dd,
+        "content_hash",
+        lambda path: content_hash(path) + ("x" if "sections" in str(path) else ""),
+    )
+    cached_parse(parse, syntax)
+    assert len(calls) == 2
@@ -27,3 +27,40 @@ def test_err(capsys):
     stp.main()
     out = capsys.readouterr().out
     assert "ERROR: File did not end" in out
+
+
+DO_FILE = """infix ///
+  str name 1-3 ///
+  long age 4-5 ///
+drop if rectype != `"P"'
+label var name `"Name"'
+label var age `"Age"'
+"""
+
+
+def test_batch(tmp_path, capsys):
+    syntax = tmp_path / "syntax"
+    syntax.mkdir()
+    (syntax / "a.do").write_text(DO_FILE)
+    (syntax / "b.do").write_text(DO_FILE.replace('label var age `"Age"\'\n', ""))
+    (syntax / "notes.txt").write_text("")
+    out = tmp_path / "dds"
+    sys.argv = ["statfile_parse", str(syntax), "--out_dir", str(out), "-j", "2"]
+    sys.argv.append("--no-cache")
+    with pytest.raises(SystemExit) as e:
+        stp.main()
+    assert e.value.code == 1
+    assert sorted(p.name for p in out.iterdir()) == ["a.do.tsv"]
+    df = pl.read_csv(out / "a.do.tsv", separator="\t")
+    assert df["Var"].to_list() == ["name", "age"]
+    err = capsys.readouterr().err
+    assert "Files: 2, parsed: 1, failed: 1" in err
+    assert "b.do: KeyError" in err
+
+
+def test_expand_syntax_files(tmp_path):
+    for name in ["b.sps", "a.sas", "c.do", "d.txt"]:
+        (tmp_path / name).write_text("")
+    assert stp.expand_syntax_files([str(tmp_path), str(tmp_path / "*.sps")]) == [
+        str(tmp_path / name) for name in ["a.sas", "b.sps", "c.do"]
+    ]
@@ -0,0 +1,71 @@
+import io
+import ipums.tools.sps_parse as sps
+from ipums.tools.statfile_sections import *
+
+SPS_FILE = """record type "H".
+data list
+  serial 2-4
+  hhwt 5-6
+.
+record type "P".
+data list
+  age 2-3
+  name 4-8 (a)
+.
+VARIABLE LABELS
+  age "Age"
+  name "Name"
+.
+VALUE LABELS
+  /age
+  0 "Less than 1"
+  99 "99+"
+.
+  serial "Ignored after the last section"
+"""
+
+
+def scan(text):
+    scanner = SectionScanner(
+        [
+            ("DataList", sps.DataList, sps.COMBOS[0]),
+            ("VarLabels", sps.VarLabel, sps.COMBOS[1]),
+            ("ValueLabels", sps.ValueLabel, sps.COMBOS[2]),
+        ]
+    )
+    return scanner.scan(io.StringIO(text))
+
+
+def test_scan():
+    sections = scan(SPS_FILE)
+    data_list = sections["DataList"]
+    assert [(d.rectype, d.name) for d in data_list] == [
+        ("H", "serial"),
+        ("H", "hhwt"),
+        ("P", "age"),
+        ("P", "name"),
+    ]
+    assert [v.name for v in sections["VarLabels"]] == ["age", "name"]
+    assert [(v.parent, v.value) for v in sections["ValueLabels"]] == [
+        ("age", "0"),
+        ("age", "99"),
+    ]
+
+
+def test_scan_unterminated():
+    sections = scan(SPS_FILE.split("VARIABLE LABELS")[0])
+    assert len(sections["DataList"]) == 4
+    assert sections["VarLabels"] == sections["ValueLabels"] == []
+
+
+def test_zipper():
+    sections = scan(SPS_FILE)
+    zipper(sections)
+    serial, hhwt, age, name = sections["DataList"]
+    assert (serial.label, serial.valuelabels) == ("", None)
+    assert age.label == "Age"
+    assert age.valuelabels == [
+        ("", "", "", "", "", "0", "", "Less than 1", "", "Less than 1"),
+        ("", "", "", "", "", "99", "", "99+", "", "99+"),
+    ]
+    assert name.label == "Name"